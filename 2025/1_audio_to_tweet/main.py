@@ -5,65 +5,781 @@ Audio-to-Tweet Generator
 A simple Streamlit app that generates tweet suggestions from an audio or video file using AssemblyAI's LeMUR.
 """
 
+import contextlib
+import contextvars
+import functools
+import io
+import json
+import logging
+import math
 import os
+import random
+import re
+import statistics
+import sys
 import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import streamlit as st
 import assemblyai as aai
+import httpx
 from dotenv import load_dotenv
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
 load_dotenv()
 
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"))
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used to size LeMUR requests
+CHARS_PER_TOKEN = 4
+# A transcript pasted into a LeMUR prompt must be wrapped like this to be recognised as a
+# copy of the context; plan_lemur_task never touches text that merely matches it
+TRANSCRIPT_BLOCK = "<transcript>\n{}\n</transcript>"
+# LeMUR requests up to this many tokens use the fast model tier (0 = always use the default model)
+LEMUR_FAST_TOKEN_BUDGET = int(os.getenv("LEMUR_FAST_TOKEN_BUDGET", "0"))
+
+# Cap on AssemblyAI requests in flight at once across the whole server process
+API_MAX_CONCURRENCY = int(os.getenv("ASSEMBLYAI_MAX_CONCURRENCY", "8"))
+# Transient API errors are retried with jittered exponential backoff (1s, 2s, 4s, ...)
+API_MAX_RETRIES = 4
+API_RETRY_BASE_DELAY = 1.0
+# Transcription usually finishes within this fraction of the audio length (but not faster
+# than the minimum), so polling backs off until then and tightens afterwards
+POLL_TURNAROUND_RATIO = 0.3
+POLL_MIN_EXPECTED_SECONDS = 5.0
+POLL_MAX_INTERVAL = 15.0
+
 SUPPORTED_FORMATS = ["mp3", "mp4", "wav", "m4a"]
+MODEL_TIERS = ["claude3_haiku", "claude3_5_sonnet", "claude3_opus"]
 
-def main():
-    st.title("🐦 Audio-to-Tweet Generator")
-    st.write("Upload audio/video to generate tweet suggestions using AI")
+TWEET_PROMPT = """
+Generate 3 catchy, engaging tweets based on the content of this audio.
+Each tweet should:
+- Be under 280 characters
+- Highlight a key insight or quote
+- Include an emoji
+- Be written in a conversational, shareable style
+- End with "#insight" or another relevant hashtag
+
+Format as three numbered tweets.
+"""
+
+THREAD_PROMPT = """
+Write a Twitter thread of 5 to 7 tweets based on the content of this audio.
+- The first tweet is a hook that makes people want to read on
+- Each following tweet covers one key point, in the order they come up in the audio
+- Every tweet is under 280 characters
+- The last tweet sums up the main takeaway
+
+Number the tweets like "1/", "2/" and so on.
+"""
+
+LINKEDIN_PROMPT = """
+Write a LinkedIn post (150 to 250 words) based on the content of this audio.
+- Open with one line that grabs attention
+- Share the most useful insights in short paragraphs
+- Keep a professional but personal tone
+- End with a question that invites comments, then 3 relevant hashtags
+"""
+
+QUOTES_PROMPT = """
+Pick the 5 most quotable sentences from this audio.
+- Quote them word for word as they were said
+- Choose lines that stand on their own without context
+- Add the speaker if it is clear who said it
+
+Format as a numbered list of quotes.
+"""
+
+# Output formats offered in the UI, each produced by its own LeMUR task on the same transcript
+OUTPUT_FORMATS = {
+    "Tweets": TWEET_PROMPT,
+    "Thread": THREAD_PROMPT,
+    "LinkedIn post": LINKEDIN_PROMPT,
+    "Pull-quotes": QUOTES_PROMPT,
+}
+
+# Opt-in sampling profiler (PROFILE=1 or the sidebar switch): each job's stacks are sampled
+# every PROFILE_INTERVAL_MS and saved to PROFILE_DIR
+PROFILE_ENABLED = os.getenv("PROFILE", "0") == "1"
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "20")) / 1000
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "audio-to-tweet-profiles"))
+# Frames from these files mean a thread is on the network or blocked on a lock, queue or select
+PROFILE_NETWORK_FILES = ("socket.py", "ssl.py")
+PROFILE_NETWORK_PACKAGES = tuple(package + os.sep for package in ("httpx", "httpcore", "h11", "websockets"))
+PROFILE_WAIT_FILES = ("threading.py", "queue.py", "selectors.py")
+
+
+@dataclass
+class HedgeConfig:
+    """Settings for racing a fast LeMUR tier against a slower one"""
+    fast_model: str = "claude3_haiku"
+    slow_model: str = "claude3_5_sonnet"
+    hedge_delay: float = 4.0
+    deadline: float = 60.0
+
+
+class LatencyStats:
+    """Thread-safe record of LeMUR latency per model tier, used to tune the hedge delay"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._failures = {}
+
+    def record(self, tier: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self._samples.setdefault(tier, []).append(seconds)
+            else:
+                self._failures[tier] = self._failures.get(tier, 0) + 1
+
+    def summary(self) -> list:
+        with self._lock:
+            rows = []
+            for tier in sorted(set(self._samples) | set(self._failures)):
+                samples = sorted(self._samples.get(tier, []))
+                rows.append({
+                    "tier": tier,
+                    "calls": len(samples),
+                    "failures": self._failures.get(tier, 0),
+                    "p50 (s)": round(statistics.median(samples), 2) if samples else None,
+                    # Nearest rank, so p95 is never below p50 even with a handful of samples
+                    "p95 (s)": round(samples[math.ceil(0.95 * len(samples)) - 1], 2) if samples else None,
+                })
+            return rows
+
+
+class AssemblyAIClient:
+    """
+    Process-wide access to AssemblyAI: one Transcriber (so one pooled keep-alive HTTP
+    client), a cap on concurrent API requests, jittered exponential retries for transient
+    errors and polling that adapts to the length of the audio.
+    """
+
+    def __init__(self, max_concurrency: int = API_MAX_CONCURRENCY, max_retries: int = API_MAX_RETRIES,
+                 base_delay: float = API_RETRY_BASE_DELAY):
+        self.transcriber = aai.Transcriber()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "polls": 0}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    @staticmethod
+    def is_transient(error: Exception) -> bool:
+        """Connection problems, rate limits and 5xx responses are worth retrying; other 4xx and failed transcripts are not"""
+        status_code = getattr(error, "status_code", None)
+        if status_code is not None:
+            return status_code == 429 or status_code >= 500
+        return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Run one API request under the concurrency limit, retrying transient failures. The
+        slot is held for this single request only, never while backing off or between polls.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._slots:
+                    self._count("requests")
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not self.is_transient(e):
+                    raise
+                self._count("retries")
+                delay = self.base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning("AssemblyAI request failed (%s), retrying in %.1fs", e, delay)
+                time.sleep(delay)
+
+    @staticmethod
+    def next_poll_delay(elapsed: float, audio_seconds: Optional[float] = None) -> float:
+        """Poll rarely while a transcript can't be finished yet and often once it is due"""
+        if audio_seconds:
+            expected = max(POLL_MIN_EXPECTED_SECONDS, audio_seconds * POLL_TURNAROUND_RATIO)
+            if elapsed < expected:
+                return min(max((expected - elapsed) / 2, 1.0), POLL_MAX_INTERVAL)
+            return 2.0
+        return min(1.0 + elapsed / 10, POLL_MAX_INTERVAL)
+
+    @staticmethod
+    def fetch_transcript(transcript_id: str) -> aai.Transcript:
+        """A transcript's current state from a single GET (the SDK's get_by_id blocks until it completes)"""
+        client = aai.Client.get_default()
+        return aai.Transcript.from_response(client=client,
+                                            response=aai.api.get_transcript(client.http_client, transcript_id))
+
+    def transcribe(self, audio_file: str, audio_seconds: Optional[float] = None,
+                   config: Optional[aai.TranscriptionConfig] = None) -> aai.Transcript:
+        """Upload and transcribe a file, returning the completed (or failed) transcript"""
+        # Upload, then create the transcript, as two requests that each take a slot only while they run
+        audio_url = self.call(self.transcriber.upload_file, audio_file)
+        transcript = self.call(self.transcriber.submit, audio_url, config=config)
+        start = time.monotonic()
+        polls = 0
+        while transcript.status not in (aai.TranscriptStatus.completed, aai.TranscriptStatus.error):
+            time.sleep(self.next_poll_delay(time.monotonic() - start, audio_seconds))
+            transcript = self.call(self.fetch_transcript, transcript.id)
+            polls += 1
+            self._count("polls")
+
+        logger.info("Transcript %s %s after %d polls in %.1fs (API stats: %s)", transcript.id,
+                    transcript.status.value, polls, time.monotonic() - start, self.stats)
+        return transcript
+
+
+@st.cache_resource
+def get_client() -> AssemblyAIClient:
+    """The AssemblyAI client shared by every session of this server process"""
+    return AssemblyAIClient()
+
+
+@st.cache_resource
+def get_latency_stats() -> LatencyStats:
+    """Latency stats shared by every session of this server process"""
+    return LatencyStats()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a piece of text (about 4 characters per token for English)"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def plan_lemur_task(prompt: str, context_text: str, default_model: aai.LemurModel,
+                    fast_model: aai.LemurModel = aai.LemurModel.claude3_haiku) -> Tuple[str, aai.LemurModel]:
+    """
+    Assemble a LeMUR task prompt and choose its model tier.
     
-    uploaded_file = st.file_uploader("Choose an audio/video file", type=SUPPORTED_FORMATS)
+    LeMUR already sends the transcript (or input text) as context, so a copy of it pasted
+    into the prompt as a TRANSCRIPT_BLOCK is removed before the request goes out. Other
+    occurrences of the same text (say, a short utterance repeated in a list of earlier
+    requests) are left alone. Requests whose
+    context + prompt fit within LEMUR_FAST_TOKEN_BUDGET use the fast tier; everything
+    else uses the app's default model. The decision is logged for every call.
+    """
+    prompt = prompt.strip()
+    context_text = context_text or ""
+    duplicated_tokens = 0
+    pasted_block = TRANSCRIPT_BLOCK.format(context_text)
+    if context_text and pasted_block in prompt:
+        duplicated_tokens = estimate_tokens(pasted_block)
+        prompt = prompt.replace(pasted_block, "(see the transcript provided as context)")
     
-    if uploaded_file and st.button("Generate Tweets"):
-        with st.spinner("Processing... This may take a minute or two."):
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f".{uploaded_file.name.split('.')[-1]}") as tmp_file:
-                tmp_file.write(uploaded_file.getvalue())
-                tmp_file_path = tmp_file.name
-            
+    context_tokens = estimate_tokens(context_text)
+    prompt_tokens = estimate_tokens(prompt)
+    total_tokens = context_tokens + prompt_tokens
+    model = fast_model if total_tokens <= LEMUR_FAST_TOKEN_BUDGET else default_model
+    logger.info(
+        "LeMUR budget: context=%d prompt=%d total=%d tokens (removed %d duplicated), budget=%d -> %s",
+        context_tokens, prompt_tokens, total_tokens, duplicated_tokens, LEMUR_FAST_TOKEN_BUDGET, model.value
+    )
+    return prompt, model
+
+
+# Threads doing a profiled job's work, by thread ident: the job's own thread while its
+# SamplingProfiler runs, and pool workers while they run a task wrapped by job_task. A profile
+# only samples its job's threads, so other jobs running at the same time stay out of it
+_job_threads: Dict[int, str] = {}
+_profiled_job: contextvars.ContextVar = contextvars.ContextVar("profiled_job", default=None)
+
+
+def job_task(fn: Callable) -> Callable:
+    """`fn`, run as part of the job being profiled on this thread, if any, when it is called on a pool worker"""
+    job_id = _profiled_job.get()
+    if job_id is None:
+        return fn
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        ident = threading.get_ident()
+        token = _profiled_job.set(job_id)
+        _job_threads[ident] = job_id
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            del _job_threads[ident]
+            _profiled_job.reset(token)
+    return run
+
+
+class SamplingProfiler:
+    """
+    Low-overhead wall-clock profiler for one job. A daemon thread wakes every `interval`
+    seconds, reads the stacks of the job's threads with sys._current_frames() and counts them:
+    the thread that entered the profiler and the pool workers running its tasks.
+    Each sample is also put in a bucket: Python on the CPU, waiting on a child process,
+    on the network, or otherwise waiting. On exit the counts are written as folded stacks
+    (`thread;outer;...;inner count`, ready for flamegraph.pl or speedscope) next to a JSON
+    summary that adds the CPU time used by this process and by any child processes.
+    """
+
+    def __init__(self, job_id: str, output_dir: str, pipeline: str, interval: float = PROFILE_INTERVAL):
+        self.job_id = job_id
+        self.pipeline = pipeline
+        self.interval = interval
+        self.folded_path = os.path.join(output_dir, f"profile-{job_id}.folded")
+        self.summary_path = os.path.join(output_dir, f"profile-{job_id}.json")
+        self.stacks: Counter = Counter()
+        self.summary: Dict[str, Any] = {}
+        self._buckets: Counter = Counter()
+        self._python_leaves: Counter = Counter()
+        self._ticks = 0
+        self._labels: Dict[Any, Tuple[str, str]] = {}
+        self._thread_cpu: Dict[int, float] = {}
+        # Frames are labelled by their path relative to the sys.path entry they were imported from
+        self._prefixes = sorted({os.path.join(os.path.abspath(p), "") for p in sys.path if p}, key=len, reverse=True)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _label(self, code) -> Tuple[str, str]:
+        """Short file name and flamegraph label of a code object"""
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            for prefix in self._prefixes:
+                if filename.startswith(prefix):
+                    filename = filename[len(prefix):]
+                    break
+            label = self._labels[code] = (filename, f"{code.co_name} ({filename}:{code.co_firstlineno})")
+        return label
+
+    def _bucket(self, thread_id: int, files: List[str], alive: bool) -> str:
+        """What a sampled thread is spending its time on; files run from the innermost frame outwards"""
+        # A thread whose CPU clock moved since the last sample was running; otherwise its
+        # frames tell what it is blocked on
+        cpu = None
+        if alive and hasattr(time, "pthread_getcpuclockid"):
+            try:
+                cpu = time.clock_gettime(time.pthread_getcpuclockid(thread_id))
+            except OSError:
+                pass
+        previous = self._thread_cpu.get(thread_id)
+        self._thread_cpu[thread_id] = cpu
+        running = None if cpu is None or previous is None else cpu > previous
+        if running:
+            return "python"
+        if "subprocess.py" in files:
+            return "subprocess"
+        if any(filename in PROFILE_NETWORK_FILES or filename.startswith(PROFILE_NETWORK_PACKAGES) for filename in files):
+            return "network"
+        if running is False or files[0] in PROFILE_WAIT_FILES:
+            return "waiting"
+        return "python"
+
+    def _sample(self) -> None:
+        # One flamegraph row per kind of thread: "ThreadPoolExecutor-0_3" -> "ThreadPoolExecutor", "Thread-3 (worker)" -> "Thread (worker)"
+        names = {thread.ident: re.sub(r"[-_]\d+", "", thread.name) for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if _job_threads.get(thread_id) != self.job_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+
+            labels = [names.get(thread_id, "thread")] + [label for _, label in reversed(stack)]
+            self.stacks[";".join(labels)] += 1
+            bucket = self._bucket(thread_id, [filename for filename, _ in stack], thread_id in names)
+            self._buckets[bucket] += 1
+            if bucket == "python":
+                self._python_leaves[stack[0][1]] += 1
+        self._ticks += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    @staticmethod
+    def _cpu_usage() -> Optional[Tuple[float, float]]:
+        """CPU seconds used so far by this process and by its finished child processes"""
+        if resource is None:
+            return None
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return own.ru_utime + own.ru_stime, children.ru_utime + children.ru_stime
+
+    def __enter__(self) -> "SamplingProfiler":
+        self._job_thread = threading.get_ident()
+        _job_threads[self._job_thread] = self.job_id
+        self._job_token = _profiled_job.set(self.job_id)
+        self._start_usage = self._cpu_usage()
+        self._start = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        del _job_threads[self._job_thread]
+        _profiled_job.reset(self._job_token)
+        wall_seconds = time.perf_counter() - self._start
+        usage = self._cpu_usage()
+
+        # Sampling itself takes time, so a sample is worth the real time between ticks
+        seconds_per_sample = wall_seconds / self._ticks if self._ticks else self.interval
+        self.summary = {
+            "job_id": self.job_id,
+            "pipeline": self.pipeline,
+            "wall_seconds": round(wall_seconds, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": sum(self.stacks.values()),
+            # Process-wide, so other jobs running at the same time are included
+            "process_cpu_seconds": round(usage[0] - self._start_usage[0], 3) if usage else None,
+            "child_cpu_seconds": round(usage[1] - self._start_usage[1], 3) if usage else None,
+            "thread_seconds": {bucket: round(self._buckets[bucket] * seconds_per_sample, 3)
+                               for bucket in ("python", "subprocess", "network", "waiting")},
+            "hottest_python": [{"frame": label, "seconds": round(count * seconds_per_sample, 3)}
+                               for label, count in self._python_leaves.most_common(10)],
+        }
+        try:
+            with open(self.folded_path, "w") as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in self.stacks.items())
+            with open(self.summary_path, "w") as f:
+                json.dump(self.summary, f, indent=2)
+        except OSError as e:
+            logger.warning("Couldn't save the profile of job %s: %s", self.job_id, e)
+        logger.info("Profile of job %s: %s", self.job_id, self.describe())
+
+    def describe(self) -> str:
+        """One-line summary of where the job's time went"""
+        seconds = self.summary["thread_seconds"]
+        text = (f"{self.summary['wall_seconds']:.1f}s wall · thread time: Python {seconds['python']:.1f}s, "
+                f"subprocesses {seconds['subprocess']:.1f}s, network {seconds['network']:.1f}s, "
+                f"waiting {seconds['waiting']:.1f}s")
+        if self.summary["child_cpu_seconds"] is not None:
+            text += f" · child process CPU {self.summary['child_cpu_seconds']:.1f}s"
+        return text
+
+
+def profile_job(enabled: bool, job_id: str, output_dir: str, pipeline: str):
+    """A SamplingProfiler around the job when profiling is on, otherwise a context that does nothing"""
+    if not enabled:
+        return contextlib.nullcontext()
+    os.makedirs(output_dir, exist_ok=True)
+    return SamplingProfiler(job_id, output_dir, pipeline)
+
+
+def profile_settings() -> bool:
+    """Sidebar switch for profiling jobs started from this session (on by default with PROFILE=1)"""
+    return st.sidebar.toggle("🔬 Profile jobs", value=PROFILE_ENABLED,
+                             help="Record where each job spends its time and offer the profile for download")
+
+
+def render_profile(profiler: Optional[SamplingProfiler]) -> None:
+    """Show a profiled job's summary with a download of its folded stacks"""
+    if profiler is None or not profiler.summary:
+        return
+    st.caption(f"🔬 Profile of job {profiler.job_id}: {profiler.describe()}")
+    if os.path.exists(profiler.folded_path):
+        with open(profiler.folded_path, "rb") as file:
+            st.download_button("Download profile (folded stacks)", data=file,
+                               file_name=os.path.basename(profiler.folded_path), mime="text/plain",
+                               key=f"profile_{profiler.job_id}")
+
+
+def save_upload(uploaded_file) -> str:
+    """Write an uploaded file to a temp path and return the path"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{uploaded_file.name.split('.')[-1]}") as tmp_file:
+        tmp_file.write(uploaded_file.getvalue())
+        return tmp_file.name
+
+
+def run_tweet_task(client: AssemblyAIClient, transcript, prompt: str, tier: str,
+                   stats: LatencyStats = None, started: threading.Event = None) -> str:
+    """
+    Run a prompt on one model tier, recording its latency. The clock starts once the request
+    has an API slot, so time spent queueing behind other requests isn't counted as LeMUR
+    latency; `started` is set at that moment.
+    """
+    start = None
+
+    def task():
+        nonlocal start
+        if start is None:
+            start = time.monotonic()
+            if started:
+                started.set()
+        return transcript.lemur.task(prompt, final_model=getattr(aai.LemurModel, tier))
+
+    try:
+        lemur_response = client.call(task)
+    except Exception:
+        if stats and start is not None:
+            stats.record(tier, time.monotonic() - start, ok=False)
+        raise
+    if stats:
+        stats.record(tier, time.monotonic() - start, ok=True)
+    return lemur_response.response
+
+
+def hedged_tweet_task(client: AssemblyAIClient, transcript, prompt: str, hedge: HedgeConfig,
+                      stats: LatencyStats = None) -> str:
+    """
+    Ask the fast tier first and only start the slow tier once the hedge delay passes
+    (or the fast tier fails). The delay counts from when the fast request gets an API slot,
+    so waiting in the queue doesn't start the slow tier; the deadline counts from the call.
+    The first non-empty response within the deadline wins; the other request is left to
+    finish in the background and its result is ignored.
+    """
+    executor = ThreadPoolExecutor(max_workers=2)
+    start = time.monotonic()
+    fast_started = threading.Event()
+    pending = {executor.submit(job_task(run_tweet_task), client, transcript, prompt, hedge.fast_model, stats,
+                               fast_started): hedge.fast_model}
+    slow_started = False
+    errors = []
+
+    try:
+        fast_started.wait(timeout=hedge.deadline)
+        hedge_start = time.monotonic()
+        while pending or not slow_started:
+            remaining = hedge.deadline - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+
+            hedge_elapsed = time.monotonic() - hedge_start
+            timeout = remaining if slow_started else min(remaining, max(0.0, hedge.hedge_delay - hedge_elapsed))
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                tier = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    errors.append(f"{tier}: {e}")
+                    continue
+                if response and response.strip():
+                    return response
+                errors.append(f"{tier}: empty response")
+
+            if not slow_started and (not pending or time.monotonic() - hedge_start >= hedge.hedge_delay):
+                pending[executor.submit(job_task(run_tweet_task), client, transcript, prompt, hedge.slow_model, stats)] = hedge.slow_model
+                slow_started = True
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    details = "; ".join(errors) if errors else f"no response within {hedge.deadline:.0f}s"
+    raise TimeoutError(f"Hedged LeMUR request failed ({details})")
+
+
+def format_slug(output_format: str) -> str:
+    """File-name friendly version of an output format name"""
+    return re.sub(r"[^a-z0-9]+", "_", output_format.lower()).strip("_")
+
+
+def transcribe_file(client: AssemblyAIClient, file_path: str):
+    """Transcribe a file, raising if AssemblyAI reports an error"""
+    transcript = client.transcribe(file_path)
+    if transcript.status == aai.TranscriptStatus.error:
+        raise RuntimeError(transcript.error)
+    return transcript
+
+
+def run_format_task(client: AssemblyAIClient, transcript, output_format: str, hedge: HedgeConfig = None,
+                    stats: LatencyStats = None) -> str:
+    """Ask LeMUR for one output format"""
+    prompt, model = plan_lemur_task(OUTPUT_FORMATS[output_format], transcript.text, aai.LemurModel.claude3_5_sonnet)
+    if hedge:
+        return hedged_tweet_task(client, transcript, prompt, hedge, stats)
+    return run_tweet_task(client, transcript, prompt, model.name, stats)
+
+
+def fan_out_formats(client: AssemblyAIClient, transcript, formats: list, hedge: HedgeConfig = None,
+                    stats: LatencyStats = None):
+    """
+    Run one LeMUR task per output format concurrently against the same transcript, so the
+    total wait is the slowest single task rather than the sum. Yields (format, response,
+    error) as each task finishes.
+    """
+    with ThreadPoolExecutor(max_workers=len(formats)) as executor:
+        futures = {executor.submit(job_task(run_format_task), client, transcript, output_format, hedge, stats): output_format
+                   for output_format in formats}
+        for future in as_completed(futures):
             try:
-                # Transcribe the audio
-                transcriber = aai.Transcriber()
-                transcript = transcriber.transcribe(tmp_file_path)
-                
-                # Use LeMUR to generate tweets
-                tweet_prompt = """
-                Generate 3 catchy, engaging tweets based on the content of this audio.
-                Each tweet should:
-                - Be under 280 characters
-                - Highlight a key insight or quote
-                - Include an emoji
-                - Be written in a conversational, shareable style
-                - End with "#insight" or another relevant hashtag
-                
-                Format as three numbered tweets.
-                """
-                
-                lemur_response = transcript.lemur.task(tweet_prompt.strip(), final_model=aai.LemurModel.claude3_5_sonnet)
-                
-                # Display results
-                st.subheader("📱 Tweet Suggestions")
-                st.write(lemur_response.response)
-                
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+def generate_outputs(client: AssemblyAIClient, file_path: str, formats: list, hedge: HedgeConfig = None,
+                     stats: LatencyStats = None) -> dict:
+    """Transcribe a file once and generate every requested format from it"""
+    transcript = transcribe_file(client, file_path)
+    outputs = {}
+    for output_format, response, error in fan_out_formats(client, transcript, formats, hedge, stats):
+        if error:
+            raise error
+        outputs[output_format] = response
+    return {output_format: outputs[output_format] for output_format in formats}
+
+
+def run_single(uploaded_file, formats: list, hedge: HedgeConfig = None) -> None:
+    """Generate every requested format for one file, showing each as soon as it's ready"""
+    tmp_file_path = save_upload(uploaded_file)
+    client = get_client()
+
+    try:
+        with st.spinner("Transcribing... This may take a minute or two."):
+            transcript = transcribe_file(client, tmp_file_path)
+
+        # One slot per format, in the order they were picked, filled as each task finishes
+        slots = {}
+        for output_format in formats:
+            st.subheader(f"📱 {output_format}")
+            slots[output_format] = st.empty()
+            slots[output_format].info(f"Writing {output_format.lower()}...")
+
+        start = time.monotonic()
+        for output_format, response, error in fan_out_formats(client, transcript, formats, hedge, get_latency_stats()):
+            with slots[output_format].container():
+                if error:
+                    st.error(f"An error occurred: {str(error)}")
+                    continue
+                st.write(response)
                 st.download_button(
-                    label="Download Tweets",
-                    data=lemur_response.response,
-                    file_name="tweet_suggestions.txt",
-                    mime="text/plain"
+                    label=f"Download {output_format}",
+                    data=response,
+                    file_name=f"{format_slug(output_format)}.txt",
+                    mime="text/plain",
+                    key=f"download_{format_slug(output_format)}"
                 )
-                
-            except Exception as e:
-                st.error(f"An error occurred: {str(e)}")
-                st.info("Make sure your AssemblyAI API key is set correctly and that you've uploaded a valid audio file.")
-            finally:
-                if os.path.exists(tmp_file_path):
-                    os.remove(tmp_file_path)
+        st.caption(f"All formats generated in {time.monotonic() - start:.1f}s")
+
+    except Exception as e:
+        st.error(f"An error occurred: {str(e)}")
+        st.info("Make sure your AssemblyAI API key is set correctly and that you've uploaded a valid audio file.")
+    finally:
+        if os.path.exists(tmp_file_path):
+            os.remove(tmp_file_path)
+
+
+def build_zip(results: dict) -> bytes:
+    """
+    Pack the generated posts into a ZIP archive, one text file per source file and format.
+    `results` is keyed by (upload index, file name); files with the same name get _2, _3, ...
+    """
+    buffer = io.BytesIO()
+    used = set()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for key in sorted(results):
+            stem = unique_stem = Path(key[1]).stem
+            number = 2
+            while unique_stem in used:
+                unique_stem = f"{stem}_{number}"
+                number += 1
+            used.add(unique_stem)
+            for output_format, text in results[key].items():
+                archive.writestr(f"{unique_stem}_{format_slug(output_format)}.txt", text)
+    return buffer.getvalue()
+
+
+def run_batch(uploaded_files, formats: list, max_workers: int, hedge: HedgeConfig = None) -> None:
+    """Generate the requested formats for many files concurrently, showing each file as it completes"""
+    # Keyed by upload position as well as name, since two uploads can have the same name
+    paths = {}
+    results = {}
+    stats = get_latency_stats()
+    client = get_client()
+
+    progress = st.progress(0.0, text=f"Processing 0 of {len(uploaded_files)} files...")
+    try:
+        for i, uploaded_file in enumerate(uploaded_files):
+            paths[i, uploaded_file.name] = save_upload(uploaded_file)
+
+        # Transcription and LeMUR are network-bound, so threads are enough to overlap them
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(job_task(generate_outputs), client, path, formats, hedge, stats): key
+                       for key, path in paths.items()}
+            for done, future in enumerate(as_completed(futures), start=1):
+                key = futures[future]
+                name = key[1]
+                try:
+                    results[key] = future.result()
+                    with st.expander(f"✅ {name}", expanded=False):
+                        for output_format, text in results[key].items():
+                            st.markdown(f"**{output_format}**")
+                            st.write(text)
+                except Exception as e:
+                    st.error(f"{name}: {str(e)}")
+                progress.progress(done / len(paths), text=f"Processing {done} of {len(paths)} files...")
+    finally:
+        for path in paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+
+    if results:
+        st.download_button(
+            label=f"Download All ({len(results)} files)",
+            data=build_zip(results),
+            file_name="social_posts.zip",
+            mime="application/zip"
+        )
+
+
+def hedge_settings() -> HedgeConfig:
+    """Sidebar controls for hedged LeMUR requests; returns None when disabled"""
+    with st.sidebar:
+        st.header("⚡ Latency")
+        if not st.toggle("Hedged requests", help="Race a fast model against a slower one and keep the first answer"):
+            return None
+
+        defaults = HedgeConfig()
+        fast_model = st.selectbox("Fast tier", MODEL_TIERS, index=MODEL_TIERS.index(defaults.fast_model))
+        slow_model = st.selectbox("Slow tier", MODEL_TIERS, index=MODEL_TIERS.index(defaults.slow_model))
+        hedge_delay = st.slider("Start slow tier after (s)", 0.0, 30.0, defaults.hedge_delay, 0.5)
+        deadline = st.slider("Deadline (s)", 10.0, 180.0, defaults.deadline, 5.0)
+
+        stats = get_latency_stats().summary()
+        if stats:
+            with st.expander("Latency per tier"):
+                st.dataframe(stats, hide_index=True)
+
+    return HedgeConfig(fast_model, slow_model, hedge_delay, deadline)
+
+
+def main():
+    st.title("🐦 Audio-to-Tweet Generator")
+    st.write("Upload audio/video to generate tweet suggestions using AI")
+
+    hedge = hedge_settings()
+    profiling = profile_settings()
+
+    formats = st.multiselect("Output formats", list(OUTPUT_FORMATS), default=["Tweets"],
+                             help="Every format is generated at the same time from a single transcript")
+
+    batch_mode = st.toggle("Batch mode (multiple files)")
+
+    if batch_mode:
+        uploaded_files = st.file_uploader("Choose audio/video files", type=SUPPORTED_FORMATS,
+                                          accept_multiple_files=True)
+        max_workers = st.slider("Files processed at once", 1, 10, 4)
+
+        if uploaded_files and formats and st.button("Generate"):
+            with profile_job(profiling, uuid.uuid4().hex, PROFILE_DIR, "run_batch") as profiler:
+                run_batch(uploaded_files, formats, max_workers, hedge)
+            render_profile(profiler)
+    else:
+        uploaded_file = st.file_uploader("Choose an audio/video file", type=SUPPORTED_FORMATS)
+
+        if uploaded_file and formats and st.button("Generate"):
+            with profile_job(profiling, uuid.uuid4().hex, PROFILE_DIR, "run_single") as profiler:
+                run_single(uploaded_file, formats, hedge)
+            render_profile(profiler)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,73 @@
+"""
+Tests for hedged LeMUR requests when the API client's slots are busy. LeMUR is replaced by
+a fake whose answers take a fixed time per model tier.
+
+Run with: python -m pytest test_hedged_requests.py
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import assemblyai as aai
+import pytest
+
+import main
+
+FAST_SECONDS = 0.2
+QUEUE_SECONDS = 0.6
+HEDGE = main.HedgeConfig(hedge_delay=0.4, deadline=5.0)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(aai.settings, "api_key", "test")
+    return main.AssemblyAIClient(max_concurrency=1)
+
+
+def fake_transcript(calls):
+    def task(prompt, final_model):
+        calls.append(final_model)
+        time.sleep(FAST_SECONDS if final_model == aai.LemurModel.claude3_haiku else 1.0)
+        return SimpleNamespace(response=f"answer from {final_model.value}")
+    return SimpleNamespace(lemur=SimpleNamespace(task=task))
+
+
+def hold_slot(client, seconds):
+    """Occupy the client's only slot from another thread, like another file in a batch"""
+    holding = threading.Event()
+
+    def busy():
+        holding.set()
+        time.sleep(seconds)
+
+    thread = threading.Thread(target=client.call, args=(busy,))
+    thread.start()
+    holding.wait()
+    return thread
+
+
+def test_queueing_for_a_slot_neither_starts_the_slow_tier_nor_counts_as_latency(client):
+    calls = []
+    stats = main.LatencyStats()
+    other = hold_slot(client, QUEUE_SECONDS)
+
+    response = main.hedged_tweet_task(client, fake_transcript(calls), "Write a tweet", HEDGE, stats)
+    other.join()
+
+    assert response == f"answer from {aai.LemurModel.claude3_haiku.value}"
+    assert calls == [aai.LemurModel.claude3_haiku]
+    [row] = stats.summary()
+    assert row["tier"] == HEDGE.fast_model
+    assert row["p50 (s)"] < QUEUE_SECONDS
+
+
+def test_single_tier_latency_starts_once_the_request_has_a_slot(client):
+    calls = []
+    stats = main.LatencyStats()
+    other = hold_slot(client, QUEUE_SECONDS)
+
+    main.run_tweet_task(client, fake_transcript(calls), "Write a tweet", "claude3_haiku", stats)
+    other.join()
+
+    assert stats.summary()[0]["p50 (s)"] == pytest.approx(FAST_SECONDS, abs=0.1)
@@ -0,0 +1,36 @@
+"""
+Tests for the LeMUR latency table shown in the sidebar, which is used to tune the hedge delay.
+
+Run with: python -m pytest test_latency_stats.py
+"""
+
+import pytest
+
+import main
+
+
+def summary(*seconds, failures=0):
+    stats = main.LatencyStats()
+    for value in seconds:
+        stats.record("fast", value, ok=True)
+    for _ in range(failures):
+        stats.record("fast", 0.0, ok=False)
+    return stats.summary()[0]
+
+
+@pytest.mark.parametrize("seconds", [(0.1, 0.2), (0.1, 0.2, 0.3), (0.4, 0.1, 0.3, 0.2)])
+def test_p95_is_never_below_p50_with_few_samples(seconds):
+    row = summary(*seconds)
+    assert row["p95 (s)"] >= row["p50 (s)"]
+    assert row["p95 (s)"] == max(seconds)
+
+
+def test_p95_is_the_nearest_rank():
+    row = summary(*[i / 10 for i in range(1, 101)])
+    assert row["p50 (s)"] == 5.05
+    assert row["p95 (s)"] == 9.5
+
+
+def test_failures_are_counted_without_latency():
+    row = summary(failures=2)
+    assert row == {"tier": "fast", "calls": 0, "failures": 2, "p50 (s)": None, "p95 (s)": None}
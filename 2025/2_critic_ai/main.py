@@ -6,38 +6,415 @@ using AssemblyAI's transcription and LeMUR capabilities.
 """
 
 import os
+import sys
+import json
+import uuid
+import contextlib
+import contextvars
+import functools
 import argparse
+import glob
+import logging
+import random
+import re
+import threading
+import array
+import math
 import tempfile
-import pyaudio
 import wave
-import assemblyai as aai
+from collections import Counter
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from rich.console import Console
 from rich.panel import Panel
-from rich.markdown import Markdown
-from dotenv import load_dotenv
-import time
-from rich.progress import Progress
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Heavy modules (assemblyai, pyaudio, soundfile, dotenv, rich.markdown) are imported inside
+# the functions that need them, so `--help` and argument errors return immediately.
 
 console = Console()
 
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used to size LeMUR requests
+CHARS_PER_TOKEN = 4
+# A transcript pasted into a LeMUR prompt must be wrapped like this to be recognised as a
+# copy of the context; plan_lemur_task never touches text that merely matches it
+TRANSCRIPT_BLOCK = "<transcript>\n{}\n</transcript>"
+
+def configure_api():
+    """Load settings from .env and configure the AssemblyAI SDK, exiting if no API key is set"""
+    import assemblyai as aai
+    from dotenv import load_dotenv
+    
+    load_dotenv()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"))
+    
+    aai_key = os.getenv("ASSEMBLYAI_API_KEY")
+    if not aai_key:
+        console.print("[bold red]Error:[/] ASSEMBLYAI_API_KEY not found in environment variables.")
+        console.print("Create a .env file with your API key: ASSEMBLYAI_API_KEY=your_key_here")
+        exit(1)
+    aai.settings.api_key = aai_key
+    
+    # Point the REST API at another host, e.g. a local stand-in server (--stream uses ASSEMBLYAI_REALTIME_URL)
+    if os.getenv("ASSEMBLYAI_BASE_URL"):
+        aai.settings.base_url = os.getenv("ASSEMBLYAI_BASE_URL")
 
-aai_key = os.getenv("ASSEMBLYAI_API_KEY")
-if not aai_key:
-    console.print("[bold red]Error:[/] ASSEMBLYAI_API_KEY not found in environment variables.")
-    console.print("Create a .env file with your API key: ASSEMBLYAI_API_KEY=your_key_here")
-    exit(1)
-aai.settings.api_key = aai_key
+STREAMING_SAMPLE_RATE = 16000
 
-def record_audio(duration=30, sample_rate=44100):
-    """Record audio from microphone for specified duration"""
-    console.print(f"[bold green]Recording[/] your movie review for {duration} seconds...")
-    console.print("🎬 Start speaking now! 🎤")
+# At most ASSEMBLYAI_MAX_CONCURRENCY (default 8) AssemblyAI requests are in flight per process
+# Transient API errors are retried with jittered exponential backoff (1s, 2s, 4s, ...)
+API_MAX_RETRIES = 4
+API_RETRY_BASE_DELAY = 1.0
+# Transcription usually finishes within this fraction of the audio length (but not faster
+# than the minimum), so polling backs off until then and tightens afterwards
+POLL_TURNAROUND_RATIO = 0.3
+POLL_MIN_EXPECTED_SECONDS = 5.0
+POLL_MAX_INTERVAL = 15.0
+# 16 kHz mono is plenty for speech and a third of the data of 44.1 kHz
+RECORDING_SAMPLE_RATE = 16000
+# RMS level (16-bit PCM) below which a chunk counts as silence
+SILENCE_THRESHOLD = 500
+
+# Frames from these files mean a thread is on the network or blocked on a lock, queue or select
+# (used by the opt-in --profile sampling profiler)
+PROFILE_NETWORK_FILES = ("socket.py", "ssl.py")
+PROFILE_NETWORK_PACKAGES = tuple(package + os.sep for package in ("httpx", "httpcore", "h11", "websockets"))
+PROFILE_WAIT_FILES = ("threading.py", "queue.py", "selectors.py")
+
+class AssemblyAIClient:
+    """
+    Process-wide access to AssemblyAI: one Transcriber (so one pooled keep-alive HTTP
+    client), a cap on concurrent API requests, jittered exponential retries for transient
+    errors and polling that adapts to the length of the audio.
+    """
+    
+    def __init__(self, max_concurrency=None, max_retries=API_MAX_RETRIES, base_delay=API_RETRY_BASE_DELAY):
+        import assemblyai as aai
+        
+        max_concurrency = max_concurrency or int(os.getenv("ASSEMBLYAI_MAX_CONCURRENCY", "8"))
+        self.transcriber = aai.Transcriber()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "polls": 0}
+    
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+    
+    @staticmethod
+    def is_transient(error):
+        """Connection problems, rate limits and 5xx responses are worth retrying; other 4xx and failed transcripts are not"""
+        import httpx
+        
+        status_code = getattr(error, "status_code", None)
+        if status_code is not None:
+            return status_code == 429 or status_code >= 500
+        return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
+    
+    def call(self, fn, *args, **kwargs):
+        """
+        Run one API request under the concurrency limit, retrying transient failures. The
+        slot is held for this single request only, never while backing off or between polls.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._slots:
+                    self._count("requests")
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not self.is_transient(e):
+                    raise
+                self._count("retries")
+                delay = self.base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning("AssemblyAI request failed (%s), retrying in %.1fs", e, delay)
+                time.sleep(delay)
+    
+    @staticmethod
+    def next_poll_delay(elapsed, audio_seconds=None):
+        """Poll rarely while a transcript can't be finished yet and often once it is due"""
+        if audio_seconds:
+            expected = max(POLL_MIN_EXPECTED_SECONDS, audio_seconds * POLL_TURNAROUND_RATIO)
+            if elapsed < expected:
+                return min(max((expected - elapsed) / 2, 1.0), POLL_MAX_INTERVAL)
+            return 2.0
+        return min(1.0 + elapsed / 10, POLL_MAX_INTERVAL)
+    
+    @staticmethod
+    def fetch_transcript(transcript_id):
+        """A transcript's current state from a single GET (the SDK's get_by_id blocks until it completes)"""
+        import assemblyai as aai
+        
+        client = aai.Client.get_default()
+        return aai.Transcript.from_response(client=client,
+                                            response=aai.api.get_transcript(client.http_client, transcript_id))
+    
+    def transcribe(self, audio_file, audio_seconds=None, config=None):
+        """Upload and transcribe a file, returning the completed (or failed) transcript"""
+        import assemblyai as aai
+        
+        # Upload, then create the transcript, as two requests that each take a slot only while they run
+        audio_url = self.call(self.transcriber.upload_file, audio_file)
+        transcript = self.call(self.transcriber.submit, audio_url, config=config)
+        start = time.monotonic()
+        polls = 0
+        while transcript.status not in (aai.TranscriptStatus.completed, aai.TranscriptStatus.error):
+            time.sleep(self.next_poll_delay(time.monotonic() - start, audio_seconds))
+            transcript = self.call(self.fetch_transcript, transcript.id)
+            polls += 1
+            self._count("polls")
+        
+        logger.info("Transcript %s %s after %d polls in %.1fs (API stats: %s)", transcript.id,
+                    transcript.status.value, polls, time.monotonic() - start, self.stats)
+        return transcript
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """The shared AssemblyAI client for this process"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AssemblyAIClient()
+        return _client
+
+# Threads doing a profiled job's work, by thread ident: the job's own thread while its
+# SamplingProfiler runs, and pool workers while they run a task wrapped by job_task. A profile
+# only samples its job's threads, so other jobs running at the same time stay out of it
+_job_threads = {}
+_profiled_job = contextvars.ContextVar("profiled_job", default=None)
+
+
+def job_task(fn):
+    """`fn`, run as part of the job being profiled on this thread, if any, when it is called on a pool worker"""
+    job_id = _profiled_job.get()
+    if job_id is None:
+        return fn
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        ident = threading.get_ident()
+        token = _profiled_job.set(job_id)
+        _job_threads[ident] = job_id
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            del _job_threads[ident]
+            _profiled_job.reset(token)
+    return run
+
+
+class SamplingProfiler:
+    """
+    Low-overhead wall-clock profiler for one job. A daemon thread wakes every `interval`
+    seconds, reads the stacks of the job's threads with sys._current_frames() and counts them:
+    the thread that entered the profiler and the pool workers running its tasks.
+    Each sample is also put in a bucket: Python on the CPU, waiting on a child process,
+    on the network, or otherwise waiting. On exit the counts are written as folded stacks
+    (`thread;outer;...;inner count`, ready for flamegraph.pl or speedscope) next to a JSON
+    summary that adds the CPU time used by this process and by any child processes.
+    """
+
+    def __init__(self, job_id, output_dir, pipeline, interval=None):
+        self.job_id = job_id
+        self.pipeline = pipeline
+        self.interval = interval or float(os.getenv("PROFILE_INTERVAL_MS", "20")) / 1000
+        self.folded_path = os.path.join(output_dir, f"profile-{job_id}.folded")
+        self.summary_path = os.path.join(output_dir, f"profile-{job_id}.json")
+        self.stacks = Counter()
+        self.summary = {}
+        self._buckets = Counter()
+        self._python_leaves = Counter()
+        self._ticks = 0
+        self._labels = {}
+        self._thread_cpu = {}
+        # Frames are labelled by their path relative to the sys.path entry they were imported from
+        self._prefixes = sorted({os.path.join(os.path.abspath(p), "") for p in sys.path if p}, key=len, reverse=True)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _label(self, code):
+        """Short file name and flamegraph label of a code object"""
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            for prefix in self._prefixes:
+                if filename.startswith(prefix):
+                    filename = filename[len(prefix):]
+                    break
+            label = self._labels[code] = (filename, f"{code.co_name} ({filename}:{code.co_firstlineno})")
+        return label
+
+    def _bucket(self, thread_id, files, alive):
+        """What a sampled thread is spending its time on; files run from the innermost frame outwards"""
+        # A thread whose CPU clock moved since the last sample was running; otherwise its
+        # frames tell what it is blocked on
+        cpu = None
+        if alive and hasattr(time, "pthread_getcpuclockid"):
+            try:
+                cpu = time.clock_gettime(time.pthread_getcpuclockid(thread_id))
+            except OSError:
+                pass
+        previous = self._thread_cpu.get(thread_id)
+        self._thread_cpu[thread_id] = cpu
+        running = None if cpu is None or previous is None else cpu > previous
+        if running:
+            return "python"
+        if "subprocess.py" in files:
+            return "subprocess"
+        if any(filename in PROFILE_NETWORK_FILES or filename.startswith(PROFILE_NETWORK_PACKAGES) for filename in files):
+            return "network"
+        if running is False or files[0] in PROFILE_WAIT_FILES:
+            return "waiting"
+        return "python"
+
+    def _sample(self):
+        # One flamegraph row per kind of thread: "ThreadPoolExecutor-0_3" -> "ThreadPoolExecutor", "Thread-3 (worker)" -> "Thread (worker)"
+        names = {thread.ident: re.sub(r"[-_]\d+", "", thread.name) for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if _job_threads.get(thread_id) != self.job_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+
+            labels = [names.get(thread_id, "thread")] + [label for _, label in reversed(stack)]
+            self.stacks[";".join(labels)] += 1
+            bucket = self._bucket(thread_id, [filename for filename, _ in stack], thread_id in names)
+            self._buckets[bucket] += 1
+            if bucket == "python":
+                self._python_leaves[stack[0][1]] += 1
+        self._ticks += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    @staticmethod
+    def _cpu_usage():
+        """CPU seconds used so far by this process and by its finished child processes"""
+        if resource is None:
+            return None
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return own.ru_utime + own.ru_stime, children.ru_utime + children.ru_stime
+
+    def __enter__(self):
+        self._job_thread = threading.get_ident()
+        _job_threads[self._job_thread] = self.job_id
+        self._job_token = _profiled_job.set(self.job_id)
+        self._start_usage = self._cpu_usage()
+        self._start = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        del _job_threads[self._job_thread]
+        _profiled_job.reset(self._job_token)
+        wall_seconds = time.perf_counter() - self._start
+        usage = self._cpu_usage()
+
+        # Sampling itself takes time, so a sample is worth the real time between ticks
+        seconds_per_sample = wall_seconds / self._ticks if self._ticks else self.interval
+        self.summary = {
+            "job_id": self.job_id,
+            "pipeline": self.pipeline,
+            "wall_seconds": round(wall_seconds, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": sum(self.stacks.values()),
+            # Process-wide, so other jobs running at the same time are included
+            "process_cpu_seconds": round(usage[0] - self._start_usage[0], 3) if usage else None,
+            "child_cpu_seconds": round(usage[1] - self._start_usage[1], 3) if usage else None,
+            "thread_seconds": {bucket: round(self._buckets[bucket] * seconds_per_sample, 3)
+                               for bucket in ("python", "subprocess", "network", "waiting")},
+            "hottest_python": [{"frame": label, "seconds": round(count * seconds_per_sample, 3)}
+                               for label, count in self._python_leaves.most_common(10)],
+        }
+        try:
+            with open(self.folded_path, "w") as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in self.stacks.items())
+            with open(self.summary_path, "w") as f:
+                json.dump(self.summary, f, indent=2)
+        except OSError as e:
+            logger.warning("Couldn't save the profile of job %s: %s", self.job_id, e)
+        logger.info("Profile of job %s: %s", self.job_id, self.describe())
+
+    def describe(self):
+        """One-line summary of where the job's time went"""
+        seconds = self.summary["thread_seconds"]
+        text = (f"{self.summary['wall_seconds']:.1f}s wall · thread time: Python {seconds['python']:.1f}s, "
+                f"subprocesses {seconds['subprocess']:.1f}s, network {seconds['network']:.1f}s, "
+                f"waiting {seconds['waiting']:.1f}s")
+        if self.summary["child_cpu_seconds"] is not None:
+            text += f" · child process CPU {self.summary['child_cpu_seconds']:.1f}s"
+        return text
+
+
+def profile_job(enabled, job_id, output_dir, pipeline):
+    """A SamplingProfiler around the job when profiling is on, otherwise a context that does nothing"""
+    if not enabled:
+        return contextlib.nullcontext()
+    os.makedirs(output_dir, exist_ok=True)
+    return SamplingProfiler(job_id, output_dir, pipeline)
+
+
+def report_profile(profiler):
+    """Print where a profiled job's time went and where its profile was saved"""
+    if profiler is None or not profiler.summary:
+        return
+    console.print(f"[dim]🔬 {profiler.describe()}[/]")
+    console.print(f"[bold green]Profile saved to:[/] {profiler.folded_path}")
+
+def audio_duration(path):
+    """Length of an audio file in seconds, or None if soundfile can't read it"""
+    import soundfile as sf
+    
+    try:
+        return sf.info(path).duration
+    except Exception:
+        return None
+
+def frame_rms(data):
+    """Root-mean-square energy of a chunk of 16-bit PCM audio"""
+    samples = array.array("h", data)
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+def record_audio(duration=30, sample_rate=RECORDING_SAMPLE_RATE, silence_seconds=2.0,
+                 silence_threshold=SILENCE_THRESHOLD):
+    """
+    Record audio from the microphone until you stop talking.
+    
+    Frames are written straight to the WAV file as they arrive. Recording ends after
+    `silence_seconds` of quiet following some speech, or after `duration` seconds at most.
+    Pass `silence_seconds=0` to always record the full duration.
+    """
+    import pyaudio
+    
+    console.print(f"[bold green]Recording[/] your movie review (up to {duration} seconds)...")
+    console.print("🎬 Start speaking now! 🎤 Recording stops when you go quiet.")
     
     # Recording parameters
     chunk = 1024
     audio_format = pyaudio.paInt16
     channels = 1
+    max_silent_chunks = int(silence_seconds * sample_rate / chunk)
+    
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
+        audio_path = tmp_file.name
     
     audio = pyaudio.PyAudio()
     
@@ -48,43 +425,192 @@ def record_audio(duration=30, sample_rate=44100):
                         input=True,
                         frames_per_buffer=chunk)
     
-    frames = []
+    wf = wave.open(audio_path, 'wb')
+    wf.setnchannels(channels)
+    wf.setsampwidth(audio.get_sample_size(audio_format))
+    wf.setframerate(sample_rate)
     
-    # Record with simpler progress indication
+    heard_speech = False
+    silent_chunks = 0
     start_time = time.time()
-    for i in range(0, int(sample_rate / chunk * duration)):
-        data = stream.read(chunk)
-        frames.append(data)
-        elapsed = time.time() - start_time
-        if i % (sample_rate // chunk) == 0:  
-            percent = min(100, int((elapsed / duration) * 100))
-            remaining = max(0, duration - elapsed)
-            console.print(f"Recording... [magenta]{percent}%[/] {int(remaining//60):02d}:{int(remaining%60):02d}", end="\r")
-    
-    # Stop and close the stream
-    stream.stop_stream()
-    stream.close()
-    audio.terminate()
-    
-    # Create temp file for audio
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
-        wf = wave.open(tmp_file.name, 'wb')
-        wf.setnchannels(channels)
-        wf.setsampwidth(audio.get_sample_size(audio_format))
-        wf.setframerate(sample_rate)
-        wf.writeframes(b''.join(frames))
+    try:
+        for i in range(0, int(sample_rate / chunk * duration)):
+            data = stream.read(chunk, exception_on_overflow=False)
+            wf.writeframes(data)
+            
+            # Stop on trailing silence once the speaker has said something
+            if frame_rms(data) >= silence_threshold:
+                heard_speech = True
+                silent_chunks = 0
+            elif heard_speech and max_silent_chunks:
+                silent_chunks += 1
+                if silent_chunks >= max_silent_chunks:
+                    break
+            
+            elapsed = time.time() - start_time
+            if i % (sample_rate // chunk) == 0:  
+                percent = min(100, int((elapsed / duration) * 100))
+                remaining = max(0, duration - elapsed)
+                console.print(f"Recording... [magenta]{percent}%[/] {int(remaining//60):02d}:{int(remaining%60):02d}", end="\r")
+    finally:
+        # Stop and close the stream
+        stream.stop_stream()
+        stream.close()
+        audio.terminate()
         wf.close()
-        return tmp_file.name
+    
+    return audio_path
 
-def generate_review(audio_file, movie_title):
-    """Transcribe audio and generate a professional review using LeMUR"""
-    with console.status("[bold blue]Transcribing your review...") as status:
-        transcriber = aai.Transcriber()
-        transcript = transcriber.transcribe(audio_file)
-        
-        status.update("[bold blue]Generating professional review...")
+def compress_audio(wav_path):
+    """
+    Encode a WAV recording as FLAC (lossless) before upload and report the savings.
+    Returns the path to the FLAC file and removes the WAV file. If encoding fails, the
+    WAV path is returned instead, so the caller uploads it and removes it as usual.
+    """
+    start = time.perf_counter()
+    flac_path = os.path.splitext(wav_path)[0] + ".flac"
+    try:
+        import soundfile as sf
         
-        review_prompt = f"""
+        data, sample_rate = sf.read(wav_path, dtype="int16")
+        sf.write(flac_path, data, sample_rate, format="FLAC", subtype="PCM_16")
+    except (ImportError, OSError, RuntimeError) as e:
+        # soundfile reports libsndfile errors as RuntimeError subclasses
+        if os.path.exists(flac_path):
+            os.remove(flac_path)
+        console.print(f"[yellow]Couldn't compress the recording ({e}), uploading it as WAV[/]")
+        return wav_path
+    elapsed = time.perf_counter() - start
+    
+    before = os.path.getsize(wav_path)
+    after = os.path.getsize(flac_path)
+    os.remove(wav_path)
+    console.print(f"[dim]Compressed recording: {before / 1024:.0f} KB → {after / 1024:.0f} KB "
+                  f"({before / max(after, 1):.1f}x smaller) in {elapsed * 1000:.0f} ms[/]")
+    return flac_path
+
+def microphone_frames(duration=30, sample_rate=STREAMING_SAMPLE_RATE, chunk=1600):
+    """Yield raw 16-bit mono PCM frames from the microphone as they are captured"""
+    import pyaudio
+    
+    audio = pyaudio.PyAudio()
+    stream = audio.open(format=pyaudio.paInt16,
+                        channels=1,
+                        rate=sample_rate,
+                        input=True,
+                        frames_per_buffer=chunk)
+    
+    start_time = time.time()
+    try:
+        while time.time() - start_time < duration:
+            yield stream.read(chunk, exception_on_overflow=False)
+            remaining = max(0, duration - (time.time() - start_time))
+            console.print(f"Recording... {int(remaining//60):02d}:{int(remaining%60):02d}", end="\r")
+    finally:
+        stream.stop_stream()
+        stream.close()
+        audio.terminate()
+
+
+def stream_transcribe(frames, sample_rate=STREAMING_SAMPLE_RATE, realtime_url=None):
+    """
+    Send PCM frames to AssemblyAI's real-time transcriber while they are being captured
+    and return the final transcript text once the stream ends.
+    
+    `frames` can be any iterable of 16-bit mono PCM byte chunks, so a WAV file or a
+    generator feeding a local websocket stand-in works as well as the microphone.
+    `realtime_url` (default: ASSEMBLYAI_REALTIME_URL) is the websocket host to use instead
+    of AssemblyAI's, such as ws://localhost:8765; the SDK appends /v2/realtime/ws.
+    """
+    import assemblyai as aai
+    
+    final_texts = []
+    errors = []
+    failed = threading.Event()
+    
+    def on_data(transcript: aai.RealtimeTranscript):
+        if isinstance(transcript, aai.RealtimeFinalTranscript) and transcript.text:
+            final_texts.append(transcript.text)
+    
+    def on_error(error: aai.RealtimeError):
+        errors.append(str(error))
+        failed.set()
+    
+    # The SDK only turns an https base URL into wss, so the websocket host gets its own client
+    realtime_url = realtime_url or os.getenv("ASSEMBLYAI_REALTIME_URL")
+    client = None
+    if realtime_url:
+        client = aai.Client(settings=aai.Settings(api_key=aai.settings.api_key, base_url=realtime_url))
+    
+    transcriber = aai.RealtimeTranscriber(
+        sample_rate=sample_rate,
+        on_data=on_data,
+        on_error=on_error,
+        client=client,
+    )
+    transcriber.connect()
+    try:
+        for chunk in frames:
+            # Connection failures arrive through on_error rather than as exceptions, so stop
+            # capturing at the first error instead of recording audio nobody will hear
+            if failed.is_set():
+                break
+            transcriber.stream(chunk)
+    finally:
+        if hasattr(frames, "close"):
+            frames.close()  # releases the microphone
+        # Closing flushes the remaining audio and waits for the last final transcript
+        transcriber.close()
+    
+    if errors:
+        raise RuntimeError(f"Real-time transcription failed: {errors[0]}")
+    return " ".join(final_texts)
+
+
+def estimate_tokens(text):
+    """Rough token count of a piece of text (about 4 characters per token for English)"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def plan_lemur_task(prompt, context_text, default_model, fast_model=None):
+    """
+    Assemble a LeMUR task prompt and choose its model tier.
+    
+    LeMUR already sends the transcript (or input text) as context, so a copy of it pasted
+    into the prompt as a TRANSCRIPT_BLOCK is removed before the request goes out. Other
+    occurrences of the same text (say, a short utterance repeated in a list of earlier
+    requests) are left alone. Requests whose
+    context + prompt fit within LEMUR_FAST_TOKEN_BUDGET use the fast tier (Claude 3 Haiku
+    unless `fast_model` is given); everything else uses the app's default model.
+    The decision is logged for every call.
+    """
+    import assemblyai as aai
+    
+    fast_model = fast_model or aai.LemurModel.claude3_haiku
+    # LeMUR requests up to this many tokens use the fast model tier (0 = always use the default model)
+    budget = int(os.getenv("LEMUR_FAST_TOKEN_BUDGET", "0"))
+    prompt = prompt.strip()
+    context_text = context_text or ""
+    duplicated_tokens = 0
+    pasted_block = TRANSCRIPT_BLOCK.format(context_text)
+    if context_text and pasted_block in prompt:
+        duplicated_tokens = estimate_tokens(pasted_block)
+        prompt = prompt.replace(pasted_block, "(see the transcript provided as context)")
+    
+    context_tokens = estimate_tokens(context_text)
+    prompt_tokens = estimate_tokens(prompt)
+    total_tokens = context_tokens + prompt_tokens
+    model = fast_model if total_tokens <= budget else default_model
+    logger.info(
+        "LeMUR budget: context=%d prompt=%d total=%d tokens (removed %d duplicated), budget=%d -> %s",
+        context_tokens, prompt_tokens, total_tokens, duplicated_tokens, budget, model.value
+    )
+    return prompt, model
+
+
+def build_review_prompt(movie_title):
+    """Prompt that turns a casual spoken review into a professional one"""
+    return f"""
         Transform this casual spoken movie review about "{movie_title}" into a 
         professional movie critic review (300-400 words).
         
@@ -96,19 +622,169 @@ def generate_review(audio_file, movie_title):
         - Use sophisticated film criticism language and references
         
         Format with proper paragraphs and a star rating at the end.
-        """
+        """.strip()
+
+
+def review_transcript(transcript, movie_title):
+    """Generate a professional review from a completed transcript using LeMUR"""
+    import assemblyai as aai
+    
+    prompt, model = plan_lemur_task(build_review_prompt(movie_title), transcript.text,
+                                    aai.LemurModel.claude3_opus)
+    lemur_response = get_client().call(transcript.lemur.task, prompt, final_model=model)
+    return lemur_response.response
+
+
+def generate_review(audio_file, movie_title):
+    """Transcribe audio and generate a professional review using LeMUR"""
+    with console.status("[bold blue]Transcribing your review...") as status:
+        transcript = get_client().transcribe(audio_file, audio_seconds=audio_duration(audio_file))
         
-        lemur_response = transcript.lemur.task(
-            review_prompt.strip(),
-            final_model=aai.LemurModel.claude3_opus
-        )
+        status.update("[bold blue]Generating professional review...")
+        
+        return review_transcript(transcript, movie_title)
+
+
+def generate_review_from_text(transcript_text, movie_title):
+    """Generate a professional review from an already transcribed text using LeMUR"""
+    import assemblyai as aai
+    
+    with console.status("[bold blue]Generating professional review..."):
+        prompt, model = plan_lemur_task(build_review_prompt(movie_title), transcript_text,
+                                        aai.LemurModel.claude3_opus)
+        lemur_response = get_client().call(aai.Lemur().task, prompt, input_text=transcript_text, final_model=model)
         return lemur_response.response
 
+
+def review_path(movie_title, output_dir=""):
+    """File name a review for the given movie is saved under"""
+    safe_title = movie_title.replace(" ", "_").lower()
+    return os.path.join(output_dir, f"{safe_title}_review.md")
+
+
+def batch_review_paths(files, output_dir, movie_title=None):
+    """
+    Movie title and review path for every file in a batch. Titles come from the file names
+    (or --title for a single file); files that would share a review name, like a/memo.wav
+    and b/memo.mp3, get numbered ones (memo_review.md, memo_review_2.md, ...).
+    """
+    outputs, used = {}, set()
+    for path in files:
+        title = movie_title if movie_title and len(files) == 1 else \
+            os.path.splitext(os.path.basename(path))[0].replace("_", " ")
+        output_path = review_path(title, output_dir)
+        stem, extension = os.path.splitext(output_path)
+        number = 2
+        while output_path in used:
+            output_path = f"{stem}_{number}{extension}"
+            number += 1
+        used.add(output_path)
+        outputs[path] = (title, output_path)
+    return outputs
+
+
+def review_and_save(transcript, movie_title, output_path):
+    """Review one completed transcript and write it to `output_path`; returns the path"""
+    import assemblyai as aai
+    
+    if transcript.status == aai.TranscriptStatus.error:
+        raise RuntimeError(transcript.error)
+    if not transcript.text:
+        raise RuntimeError("No speech was detected in the recording")
+    
+    review = review_transcript(transcript, movie_title)
+    with open(output_path, "w") as f:
+        f.write(review)
+    return output_path
+
+
+def batch_review(patterns, output_dir=".", concurrency=4, movie_title=None):
+    """
+    Turn pre-recorded voice memos into reviews without touching the microphone.
+    
+    Every file is submitted for transcription up front; as each transcript completes its
+    review is generated and written by a pool of at most `concurrency` workers. The movie
+    title comes from the file name unless a single file is given with --title.
+    """
+    files = sorted({path for pattern in patterns for path in glob.glob(pattern)})
+    if not files:
+        console.print(f"[bold red]Error:[/] No files match {' '.join(patterns)}")
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    
+    console.print(f"[bold]Reviewing {len(files)} recording(s)[/] with up to {concurrency} at a time...")
+    start_time = time.perf_counter()
+    client = get_client()
+    outputs = batch_review_paths(files, output_dir, movie_title)
+    audio_seconds = 0.0
+    succeeded = 0
+    
+    with ThreadPoolExecutor(max_workers=min(len(files), 32)) as transcription_pool, \
+            ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # Upload and transcribe everything at once; the shared client caps requests in flight
+        transcriptions = {
+            transcription_pool.submit(job_task(client.transcribe), path, audio_duration(path)): path for path in files
+        }
+        reviews = {}
+        for future in as_completed(transcriptions):
+            path = transcriptions[future]
+            try:
+                transcript = future.result()
+            except Exception as e:
+                console.print(f"[red]✗[/] {path}: {str(e)}")
+                continue
+            audio_seconds += transcript.audio_duration or 0
+            reviews[executor.submit(job_task(review_and_save), transcript, *outputs[path])] = path
+        
+        for future in as_completed(reviews):
+            path = reviews[future]
+            try:
+                console.print(f"[green]✓[/] {path} → {future.result()}")
+                succeeded += 1
+            except Exception as e:
+                console.print(f"[red]✗[/] {path}: {str(e)}")
+    
+    elapsed = time.perf_counter() - start_time
+    console.print(Panel.fit(
+        f"Reviews written: [bold]{succeeded}[/] of {len(files)}\n"
+        f"Audio processed: {audio_seconds / 60:.1f} min in {elapsed:.1f} s\n"
+        f"Throughput: {succeeded / elapsed * 60:.1f} reviews/min, "
+        f"{audio_seconds / elapsed:.1f}x real time\n"
+        f"API requests: {client.stats['requests']} ({client.stats['retries']} retries, {client.stats['polls']} polls)",
+        title="Batch Summary", border_style="cyan"
+    ))
+
 def main():
     parser = argparse.ArgumentParser(description="Transform your casual movie review into a professional critic review")
-    parser.add_argument("--title", "-t", required=True, help="Title of the movie you're reviewing")
-    parser.add_argument("--duration", "-d", type=int, default=30, help="Recording duration in seconds (default: 30)")
+    parser.add_argument("--title", "-t", help="Title of the movie you're reviewing")
+    parser.add_argument("--duration", "-d", type=int, default=30, help="Maximum recording duration in seconds (default: 30)")
+    parser.add_argument("--silence", type=float, default=2.0,
+                        help="Stop after this many seconds of silence, 0 to record the full duration (default: 2)")
+    parser.add_argument("--no-compress", action="store_true",
+                        help="Upload the raw WAV recording instead of compressing it to FLAC")
+    parser.add_argument("--stream", "-s", action="store_true",
+                        help="Transcribe in real time while recording instead of uploading afterwards")
+    parser.add_argument("--input", "-i", nargs="+", metavar="FILE_OR_GLOB",
+                        help="Review pre-recorded audio files instead of recording (titles come from file names)")
+    parser.add_argument("--output-dir", default=".", help="Where to save reviews in --input mode (default: .)")
+    parser.add_argument("--concurrency", "-c", type=int, default=4,
+                        help="Reviews generated at once in --input mode (default: 4)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Save a sampling profile of the job next to its output (same as PROFILE=1)")
     args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    
+    configure_api()
+    args.profile = args.profile or os.getenv("PROFILE") == "1"
+    
+    if args.input:
+        with profile_job(args.profile, uuid.uuid4().hex, args.output_dir, "batch_review") as profiler:
+            batch_review(args.input, args.output_dir, args.concurrency, args.title)
+        report_profile(profiler)
+        return
+    if not args.title:
+        parser.error("--title is required when recording a review")
     
     console.print(Panel.fit(
         "[bold cyan]🎬 CriticAI: Voice-to-Professional Movie Review 🎭[/]\n"
@@ -117,23 +793,41 @@ def main():
     ))
     
     try:
-        # Record audio
-        audio_file = record_audio(duration=args.duration)
-        console.print("[green]✓[/] Recording complete!")
-        
-        # Generate review
-        console.print("\n[bold]Transforming your casual thoughts into professional criticism...[/]")
-        review = generate_review(audio_file, args.title)
+        if args.stream:
+            # Transcribe while recording so the transcript is ready right after we stop
+            console.print(f"[bold green]Recording[/] your movie review for {args.duration} seconds...")
+            console.print("🎬 Start speaking now! 🎤")
+            transcript_text = stream_transcribe(microphone_frames(duration=args.duration))
+            console.print("[green]✓[/] Recording complete!")
+            if not transcript_text:
+                raise RuntimeError("No speech was detected in the recording")
+            
+            console.print("\n[bold]Transforming your casual thoughts into professional criticism...[/]")
+            with profile_job(args.profile, uuid.uuid4().hex, ".", "generate_review_from_text") as profiler:
+                review = generate_review_from_text(transcript_text, args.title)
+        else:
+            # Record audio
+            audio_file = record_audio(duration=args.duration, silence_seconds=args.silence)
+            console.print("[green]✓[/] Recording complete!")
+            if not args.no_compress:
+                audio_file = compress_audio(audio_file)
+            
+            # Generate review
+            console.print("\n[bold]Transforming your casual thoughts into professional criticism...[/]")
+            with profile_job(args.profile, uuid.uuid4().hex, ".", "generate_review") as profiler:
+                review = generate_review(audio_file, args.title)
         
         # Print results
+        from rich.markdown import Markdown
         console.print(Panel(Markdown(review), title=f"Professional Review: {args.title}", 
                            border_style="green", expand=False))
         
         # Save review to file
-        safe_title = args.title.replace(" ", "_").lower()
-        with open(f"{safe_title}_review.md", "w") as f:
+        output_path = review_path(args.title)
+        with open(output_path, "w") as f:
             f.write(review)
-        console.print(f"[bold green]Review saved to:[/] {safe_title}_review.md")
+        console.print(f"[bold green]Review saved to:[/] {output_path}")
+        report_profile(profiler)
         
     except Exception as e:
         console.print(f"[bold red]Error:[/] {str(e)}")
@@ -0,0 +1,121 @@
+"""
+Tests for CriticAI's --input batch mode. AssemblyAI is replaced by an in-process fake at
+the HTTP-request level (upload, submit, one status GET per poll, one LeMUR call per review),
+so the real AssemblyAIClient decides when each request gets one of its slots.
+
+Run with: python -m pytest test_batch_review.py
+"""
+
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import assemblyai as aai
+import pytest
+
+import main
+
+SLOTS = 2
+REQUEST_SECONDS = 0.01
+TRANSCRIBE_STEP_SECONDS = 0.3
+
+
+class FakeAPI:
+    """Transcript i completes (i + 1) * TRANSCRIBE_STEP_SECONDS after it is submitted"""
+
+    def __init__(self):
+        self.created = {}
+        self.completed = {}
+        self.review_started = []
+        self.slot_waits = []
+        self._lock = threading.Lock()
+
+    def upload_file(self, path):
+        time.sleep(REQUEST_SECONDS)
+        return f"https://uploads.invalid/{len(self.created)}/{os.path.basename(path)}"
+
+    def submit(self, audio_url, config=None):
+        time.sleep(REQUEST_SECONDS)
+        with self._lock:
+            transcript_id = f"t{len(self.created)}"
+            self.created[transcript_id] = time.monotonic()
+        return SimpleNamespace(id=transcript_id, status=aai.TranscriptStatus.queued)
+
+    def fetch_transcript(self, transcript_id):
+        time.sleep(REQUEST_SECONDS)
+        index = int(transcript_id[1:])
+        done = time.monotonic() - self.created[transcript_id] >= (index + 1) * TRANSCRIBE_STEP_SECONDS
+        if done:
+            with self._lock:
+                self.completed.setdefault(transcript_id, time.monotonic())
+        return SimpleNamespace(id=transcript_id, text="Loved it, great pacing." if done else None,
+                               status=aai.TranscriptStatus.completed if done else aai.TranscriptStatus.processing,
+                               audio_duration=5, error=None)
+
+
+@pytest.fixture
+def api(monkeypatch):
+    fake = FakeAPI()
+    monkeypatch.setattr(aai.settings, "api_key", "test")
+    client = main.AssemblyAIClient(max_concurrency=SLOTS)
+    client.transcriber = fake
+    monkeypatch.setattr(client, "fetch_transcript", fake.fetch_transcript)
+    monkeypatch.setattr(client, "next_poll_delay", lambda elapsed, audio_seconds=None: 0.05)
+    monkeypatch.setattr(main, "_client", client)
+    monkeypatch.setattr(main, "audio_duration", lambda path: 5.0)
+
+    def review_transcript(transcript, movie_title):
+        started = time.monotonic()
+        fake.review_started.append(started)
+
+        def lemur_task():
+            fake.slot_waits.append(time.monotonic() - started)
+            time.sleep(REQUEST_SECONDS)
+            return f"# {movie_title}\n\nA review."
+
+        return client.call(lemur_task)
+
+    monkeypatch.setattr(main, "review_transcript", review_transcript)
+    return fake
+
+
+def make_memos(directory, names):
+    os.makedirs(directory, exist_ok=True)
+    for name in names:
+        open(os.path.join(directory, name), "wb").close()
+
+
+def test_reviews_start_while_other_files_are_still_transcribing(api, tmp_path):
+    files = [f"memo_{i}.wav" for i in range(3 * SLOTS)]
+    make_memos(tmp_path / "memos", files)
+
+    main.batch_review([str(tmp_path / "memos" / "*.wav")], str(tmp_path / "reviews"), concurrency=SLOTS)
+
+    assert len(os.listdir(tmp_path / "reviews")) == len(files)
+    assert len(api.review_started) == len(files)
+    # More files than API slots, yet transcriptions still in progress don't keep a slot between
+    # polls: reviews start before the last transcript is done and get a slot right away
+    assert min(api.review_started) < max(api.completed.values())
+    assert max(api.slot_waits) < TRANSCRIBE_STEP_SECONDS / 3
+
+
+def test_files_with_the_same_name_get_separate_reviews(api, tmp_path):
+    make_memos(tmp_path / "a", ["memo.wav"])
+    make_memos(tmp_path / "b", ["memo.mp3"])
+
+    main.batch_review([str(tmp_path / "a" / "*"), str(tmp_path / "b" / "*")], str(tmp_path / "reviews"))
+
+    assert sorted(os.listdir(tmp_path / "reviews")) == ["memo_review.md", "memo_review_2.md"]
+
+
+@pytest.mark.parametrize("concurrency", ["0", "-2"])
+def test_concurrency_below_one_is_a_usage_error(monkeypatch, capsys, concurrency):
+    monkeypatch.setattr(sys, "argv", ["main.py", "--input", "memo.wav", "--concurrency", concurrency])
+
+    with pytest.raises(SystemExit) as exit_info:
+        main.main()
+
+    assert exit_info.value.code == 2
+    assert "--concurrency must be at least 1" in capsys.readouterr().err
@@ -0,0 +1,115 @@
+"""
+Tests for CriticAI's --stream mode against a local stand-in for AssemblyAI's real-time
+websocket, reached through the ASSEMBLYAI_REALTIME_URL override.
+
+Run with: python -m pytest test_stream_transcribe.py
+"""
+
+import json
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import assemblyai as aai
+import pytest
+from websockets.sync.server import serve
+
+import main
+
+CHUNK = b"\0" * 3200  # 100 ms of 16 kHz 16-bit mono silence
+
+
+def message(message_type, **fields):
+    return json.dumps({"message_type": message_type, **fields})
+
+
+def final_transcript(text):
+    return message("FinalTranscript", audio_start=0, audio_end=1000, confidence=0.9, text=text, words=[],
+                   created=datetime.now(timezone.utc).isoformat(), punctuated=True, text_formatted=True)
+
+
+class StandIn:
+    """Real-time stand-in: one final transcript per `chunks_per_sentence` audio chunks"""
+
+    def __init__(self, chunks_per_sentence=5, fail_after=None):
+        self.chunks_per_sentence = chunks_per_sentence
+        self.fail_after = fail_after
+        self.paths = []
+        self.chunks = 0
+
+    def handler(self, websocket):
+        self.paths.append(websocket.request.path)
+        websocket.send(message("SessionBegins", session_id=str(uuid.uuid4()),
+                               expires_at=datetime.now(timezone.utc).isoformat()))
+        for data in websocket:
+            if isinstance(data, bytes):
+                self.chunks += 1
+                if self.chunks == self.fail_after:
+                    websocket.send(json.dumps({"error": "Audio too short"}))
+                elif self.chunks % self.chunks_per_sentence == 0:
+                    websocket.send(final_transcript(f"Sentence {self.chunks // self.chunks_per_sentence}."))
+            elif json.loads(data).get("terminate_session"):
+                websocket.send(message("SessionTerminated"))
+                return
+
+
+@pytest.fixture(autouse=True)
+def api_key(monkeypatch):
+    monkeypatch.setattr(aai.settings, "api_key", "test")
+
+
+def start(stand_in, monkeypatch):
+    server = serve(stand_in.handler, "127.0.0.1", 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("ASSEMBLYAI_REALTIME_URL", f"ws://127.0.0.1:{server.socket.getsockname()[1]}")
+    return server
+
+
+def counted(frames, sent, seconds=0):
+    """Yield frames, recording each one sent, optionally at a microphone's steady pace"""
+    for frame in frames:
+        time.sleep(seconds)
+        sent.append(frame)
+        yield frame
+
+
+def test_transcript_comes_from_the_realtime_url(monkeypatch):
+    stand_in = StandIn()
+    server = start(stand_in, monkeypatch)
+    try:
+        text = main.stream_transcribe([CHUNK] * 10)
+    finally:
+        server.shutdown()
+
+    assert text == "Sentence 1. Sentence 2."
+    assert stand_in.paths[0].startswith("/v2/realtime/ws?sample_rate=16000")
+
+
+def test_capture_stops_at_the_first_error(monkeypatch):
+    stand_in = StandIn(fail_after=2)
+    server = start(stand_in, monkeypatch)
+    sent = []
+    try:
+        with pytest.raises(RuntimeError, match="Audio too short"):
+            main.stream_transcribe(counted([CHUNK] * 100, sent, seconds=0.01))
+    finally:
+        server.shutdown()
+
+    assert len(sent) < 100
+
+
+def test_connection_failure_stops_capture_right_away(monkeypatch):
+    # Nothing listens on a port we just released, so connecting fails
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setenv("ASSEMBLYAI_REALTIME_URL", f"ws://127.0.0.1:{port}")
+    sent = []
+
+    with pytest.raises(RuntimeError, match="Could not connect"):
+        main.stream_transcribe(counted([CHUNK] * 100, sent))
+
+    assert len(sent) == 1
+
@@ -6,16 +6,40 @@ and generates ready-to-share video clips with captions.
 """
 
 import assemblyai as aai
+import httpx
 import streamlit as st
 import tempfile
 from pathlib import Path
 import os
+import logging
+import random
+import secrets
 import shutil
 import subprocess
 import re
-from typing import List, Dict, Union, Optional, Tuple, Any
+import bisect
+import contextlib
+import contextvars
+import functools
+import hashlib
+import json
+import sys
+import threading
+import time
+import uuid
+import weakref
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Dict, Optional, Tuple, Any
 from dotenv import load_dotenv
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
 load_dotenv()
 api_key = os.getenv("ASSEMBLYAI_API_KEY")
 if not api_key:
@@ -25,6 +49,1132 @@ else:
 
 st.set_page_config(page_title="PodcastClipper", page_icon="🎙️")
 
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"))
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used to size LeMUR requests
+CHARS_PER_TOKEN = 4
+# A transcript pasted into a LeMUR prompt must be wrapped like this to be recognised as a
+# copy of the context; plan_lemur_task never touches text that merely matches it
+TRANSCRIPT_BLOCK = "<transcript>\n{}\n</transcript>"
+# LeMUR requests up to this many tokens use the fast model tier (0 = always use the default model)
+LEMUR_FAST_TOKEN_BUDGET = int(os.getenv("LEMUR_FAST_TOKEN_BUDGET", "0"))
+
+# Cap on AssemblyAI requests in flight at once across the whole server process
+API_MAX_CONCURRENCY = int(os.getenv("ASSEMBLYAI_MAX_CONCURRENCY", "8"))
+# Transient API errors are retried with jittered exponential backoff (1s, 2s, 4s, ...)
+API_MAX_RETRIES = 4
+API_RETRY_BASE_DELAY = 1.0
+# Transcription usually finishes within this fraction of the audio length (but not faster
+# than the minimum), so polling backs off until then and tightens afterwards
+POLL_TURNAROUND_RATIO = 0.3
+POLL_MIN_EXPECTED_SECONDS = 5.0
+POLL_MAX_INTERVAL = 15.0
+# Optional webhook completion: set ASSEMBLYAI_WEBHOOK_URL to a public URL that forwards to
+# WEBHOOK_HOST:WEBHOOK_PORT and transcripts complete on callback, with polling as fallback.
+# The receiver only listens on localhost unless WEBHOOK_HOST says otherwise, and each app
+# has its own default port so PodClipper and CodeClipper can run on one host
+WEBHOOK_PUBLIC_URL = os.getenv("ASSEMBLYAI_WEBHOOK_URL", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8765"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(24)
+WEBHOOK_SECRET_HEADER = "X-Webhook-Secret"
+# Fall back to polling if the callback hasn't arrived after this many seconds
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "900"))
+# A callback can beat the job to wait(); one nobody claims within this many seconds is dropped
+WEBHOOK_UNCLAIMED_SECONDS = 60.0
+
+# Scratch disk for uploads and rendered clips: one directory per job under SCRATCH_DIR,
+# capped at SCRATCH_QUOTA_MB in total; leftovers older than SCRATCH_ORPHAN_HOURS are
+# removed when the server starts
+SCRATCH_ROOT = os.getenv("SCRATCH_DIR", os.path.join(tempfile.gettempdir(), "podclipper"))
+SCRATCH_QUOTA_BYTES = int(float(os.getenv("SCRATCH_QUOTA_MB", "2048")) * 1024 * 1024)
+SCRATCH_ORPHAN_AGE = float(os.getenv("SCRATCH_ORPHAN_HOURS", "6")) * 3600
+
+# Media index: where sources can be cut cleanly, cached by content hash
+MEDIA_INDEX_DIR = os.getenv("MEDIA_INDEX_DIR", os.path.join(tempfile.gettempdir(), "podclipper-index"))
+MEDIA_INDEX_VERSION = 2
+SCENE_THRESHOLD = 0.3
+SILENCE_NOISE = "-35dB"
+SILENCE_MIN_SECONDS = 0.5
+# Waveform peaks: one peak level per PEAK_INTERVAL seconds of audio resampled to PEAK_SAMPLE_RATE
+PEAK_INTERVAL = 0.05
+PEAK_SAMPLE_RATE = 8000
+# How far a LeMUR timestamp may move to land on a scene change or pause
+BOUNDARY_SNAP_SECONDS = 5.0
+
+# Trim control: seconds shown either side of a clip, and waveform resolution
+TRIM_MARGIN_SECONDS = 15.0
+TRIM_WAVEFORM_POINTS = 300
+
+# Optional mezzanine ingest: sources cut once into short keyframe-aligned segments
+MEZZANINE_ENABLED = os.getenv("MEZZANINE_SEGMENTS", "0") == "1"
+MEZZANINE_DIR = os.getenv("MEZZANINE_DIR", os.path.join(tempfile.gettempdir(), "podclipper-mezzanine"))
+MEZZANINE_SEGMENT_SECONDS = float(os.getenv("MEZZANINE_SEGMENT_SECONDS", "6"))
+MEZZANINE_QUOTA_BYTES = int(float(os.getenv("MEZZANINE_QUOTA_MB", "10240")) * 1024 * 1024)
+# Segments and re-encoded clip edges share these settings so they can be joined without re-encoding
+MEZZANINE_ENCODE = [
+    "-c:v", "libx264", "-preset", "veryfast", "-crf", "20", "-pix_fmt", "yuv420p",
+    "-c:a", "aac", "-b:a", "192k", "-ar", "48000"
+]
+
+# Opt-in sampling profiler (PROFILE=1 or the sidebar switch): each job's stacks are sampled
+# every PROFILE_INTERVAL_MS and saved to PROFILE_DIR, outside scratch so they outlive the job
+PROFILE_ENABLED = os.getenv("PROFILE", "0") == "1"
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "20")) / 1000
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "podclipper-profiles"))
+# Frames from these files mean a thread is on the network or blocked on a lock, queue or select
+PROFILE_NETWORK_FILES = ("socket.py", "ssl.py")
+PROFILE_NETWORK_PACKAGES = tuple(package + os.sep for package in ("httpx", "httpcore", "h11", "websockets"))
+PROFILE_WAIT_FILES = ("threading.py", "queue.py", "selectors.py")
+
+# Fields every clip in LeMUR's JSON answer must have
+CLIP_FIELDS = {
+    "timestamp": "the timestamp where the clip should start (in MM:SS format)",
+    "title": "a catchy title for the clip (60 characters max)",
+    "summary": "a one-sentence summary of why this clip is interesting",
+}
+
+
+class WebhookReceiver:
+    """
+    Small local HTTP server for AssemblyAI webhook callbacks. Each POST carries
+    {"transcript_id": ..., "status": ...}; the job waiting on that transcript is woken up
+    instead of polling. Any server that POSTs the same JSON (with the secret header)
+    can stand in for AssemblyAI when testing. Callbacks for transcripts nobody is waiting
+    on are kept for WEBHOOK_UNCLAIMED_SECONDS, in case their job is about to wait, and then dropped.
+    """
+
+    def __init__(self, public_url: str, port: int, secret: str, host: str = WEBHOOK_HOST):
+        self.public_url = public_url
+        self.secret = secret
+        self._events: Dict[str, threading.Event] = {}
+        self._unclaimed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.headers.get(WEBHOOK_SECRET_HEADER) != receiver.secret:
+                    self.send_response(401)
+                    self.end_headers()
+                    return
+                try:
+                    payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                    transcript_id = payload["transcript_id"]
+                except (ValueError, KeyError, TypeError):
+                    self.send_response(400)
+                    self.end_headers()
+                    return
+                receiver._arrived(transcript_id)
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                logger.debug("Webhook: " + format, *args)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _arrived(self, transcript_id: str) -> None:
+        """Wake the job waiting on this transcript, or hold the callback briefly for a job about to wait"""
+        now = time.monotonic()
+        with self._lock:
+            event = self._events.get(transcript_id)
+            if event:
+                event.set()
+                return
+            for stale_id in [i for i, arrived in self._unclaimed.items() if now - arrived > WEBHOOK_UNCLAIMED_SECONDS]:
+                del self._unclaimed[stale_id]
+            self._unclaimed[transcript_id] = now
+
+    def configure(self, config: Optional[aai.TranscriptionConfig] = None) -> aai.TranscriptionConfig:
+        """Transcription config that asks AssemblyAI to call this receiver when done"""
+        config = config or aai.TranscriptionConfig()
+        config.set_webhook(self.public_url, WEBHOOK_SECRET_HEADER, self.secret)
+        return config
+
+    def wait(self, transcript_id: str, timeout: float) -> bool:
+        """Block until the callback for `transcript_id` arrives; False on timeout"""
+        with self._lock:
+            if self._unclaimed.pop(transcript_id, None) is not None:
+                return True
+            event = self._events[transcript_id] = threading.Event()
+        arrived = event.wait(timeout)
+        # A callback that comes after the timeout finds no waiter and ends up in _unclaimed until it expires
+        with self._lock:
+            self._events.pop(transcript_id, None)
+        return arrived
+
+
+@st.cache_resource
+def get_webhook_receiver() -> Optional[WebhookReceiver]:
+    """Start the webhook receiver once per server process, or None to keep polling"""
+    if not WEBHOOK_PUBLIC_URL:
+        return None
+    try:
+        receiver = WebhookReceiver(WEBHOOK_PUBLIC_URL, WEBHOOK_PORT, WEBHOOK_SECRET)
+    except OSError as e:
+        logger.warning("Could not start webhook receiver on %s:%d (%s); using polling", WEBHOOK_HOST, WEBHOOK_PORT, e)
+        return None
+    logger.info("Webhook receiver listening on %s:%d for %s", WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PUBLIC_URL)
+    return receiver
+
+
+class AssemblyAIClient:
+    """
+    Process-wide access to AssemblyAI: one Transcriber (so one pooled keep-alive HTTP
+    client), a cap on concurrent API requests, jittered exponential retries for transient
+    errors and polling that adapts to the length of the audio.
+    """
+
+    def __init__(self, max_concurrency: int = API_MAX_CONCURRENCY, max_retries: int = API_MAX_RETRIES,
+                 base_delay: float = API_RETRY_BASE_DELAY):
+        self.transcriber = aai.Transcriber()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "polls": 0}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    @staticmethod
+    def is_transient(error: Exception) -> bool:
+        """Connection problems, rate limits and 5xx responses are worth retrying; other 4xx and failed transcripts are not"""
+        status_code = getattr(error, "status_code", None)
+        if status_code is not None:
+            return status_code == 429 or status_code >= 500
+        return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Run one API request under the concurrency limit, retrying transient failures. The
+        slot is held for this single request only, never while backing off or between polls.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._slots:
+                    self._count("requests")
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not self.is_transient(e):
+                    raise
+                self._count("retries")
+                delay = self.base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning("AssemblyAI request failed (%s), retrying in %.1fs", e, delay)
+                time.sleep(delay)
+
+    @staticmethod
+    def next_poll_delay(elapsed: float, audio_seconds: Optional[float] = None) -> float:
+        """Poll rarely while a transcript can't be finished yet and often once it is due"""
+        if audio_seconds:
+            expected = max(POLL_MIN_EXPECTED_SECONDS, audio_seconds * POLL_TURNAROUND_RATIO)
+            if elapsed < expected:
+                return min(max((expected - elapsed) / 2, 1.0), POLL_MAX_INTERVAL)
+            return 2.0
+        return min(1.0 + elapsed / 10, POLL_MAX_INTERVAL)
+
+    @staticmethod
+    def fetch_transcript(transcript_id: str) -> aai.Transcript:
+        """A transcript's current state from a single GET (the SDK's get_by_id blocks until it completes)"""
+        client = aai.Client.get_default()
+        return aai.Transcript.from_response(client=client,
+                                            response=aai.api.get_transcript(client.http_client, transcript_id))
+
+    def transcribe(self, audio_file: str, audio_seconds: Optional[float] = None,
+                   config: Optional[aai.TranscriptionConfig] = None,
+                   webhook: Optional[WebhookReceiver] = None) -> aai.Transcript:
+        """
+        Upload and transcribe a file, returning the completed (or failed) transcript.
+        With a webhook receiver the job sleeps until AssemblyAI's callback arrives and
+        only falls back to polling if it doesn't come within WEBHOOK_TIMEOUT.
+        """
+        if webhook:
+            config = webhook.configure(config)
+        # Upload, then create the transcript, as two requests that each take a slot only while they run
+        audio_url = self.call(self.transcriber.upload_file, audio_file)
+        transcript = self.call(self.transcriber.submit, audio_url, config=config)
+        start = time.monotonic()
+        polls = 0
+        if webhook:
+            if webhook.wait(transcript.id, WEBHOOK_TIMEOUT):
+                transcript = self.call(self.fetch_transcript, transcript.id)
+            else:
+                logger.warning("No webhook for transcript %s after %.0fs, falling back to polling",
+                               transcript.id, WEBHOOK_TIMEOUT)
+        while transcript.status not in (aai.TranscriptStatus.completed, aai.TranscriptStatus.error):
+            time.sleep(self.next_poll_delay(time.monotonic() - start, audio_seconds))
+            transcript = self.call(self.fetch_transcript, transcript.id)
+            polls += 1
+            self._count("polls")
+
+        logger.info("Transcript %s %s after %d polls in %.1fs (API stats: %s)", transcript.id,
+                    transcript.status.value, polls, time.monotonic() - start, self.stats)
+        return transcript
+
+
+@st.cache_resource
+def get_client() -> AssemblyAIClient:
+    """The AssemblyAI client shared by every session of this server process"""
+    return AssemblyAIClient()
+
+
+class ScratchFullError(RuntimeError):
+    """No scratch space for a new job without deleting files that are still in use"""
+
+
+class ScratchSpace:
+    """
+    Bounded scratch disk for uploads and FFmpeg outputs.
+    
+    Every job gets its own directory under `root`. A job directory is deleted as soon as
+    its reference count drops to zero, total usage is kept under `quota_bytes` by evicting
+    the least recently used idle jobs (held only by their session's lease, not by a running
+    job or render), and directories left behind by earlier runs are swept on startup. Files
+    still in use are never deleted: if only busy jobs are left, new jobs are refused.
+    """
+
+    def __init__(self, root: str, quota_bytes: int, orphan_age: float):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+        os.makedirs(root, exist_ok=True)
+        self.sweep_orphans(orphan_age)
+
+    def sweep_orphans(self, max_age: float) -> None:
+        """Delete job directories not owned by this process and untouched for `max_age` seconds"""
+        cutoff = time.time() - max_age
+        for entry in os.scandir(self.root):
+            try:
+                if entry.name in self._jobs or entry.stat().st_mtime >= cutoff:
+                    continue
+                if entry.is_dir():
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _evict_idle(self, keep: Optional[str] = None) -> int:
+        """Delete least recently used idle jobs until under quota; returns the bytes still in use"""
+        evicted = []
+        with self._lock:
+            total = sum(job["bytes"] for job in self._jobs.values())
+            for other_id, job in list(self._jobs.items()):
+                if total <= self.quota_bytes:
+                    break
+                if other_id == keep or job["refs"] > 1:
+                    continue
+                total -= self._jobs.pop(other_id)["bytes"]
+                evicted.append(other_id)
+        for other_id in evicted:
+            logger.info("Scratch quota exceeded, evicting job %s", other_id)
+            shutil.rmtree(os.path.join(self.root, other_id), ignore_errors=True)
+        return total
+
+    def create_job(self) -> str:
+        """Create a job directory holding one reference, or raise ScratchFullError if busy jobs fill the quota"""
+        if self._evict_idle() > self.quota_bytes:
+            raise ScratchFullError("The scratch disk is full with jobs that are still running. Please try again in a minute.")
+        job_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(self.root, job_id))
+        with self._lock:
+            self._jobs[job_id] = {"refs": 1, "bytes": 0}
+        return job_id
+
+    def acquire(self, job_id: str) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id]["refs"] += 1
+
+    def release(self, job_id: str) -> None:
+        """Drop one reference, deleting the job's files once nothing uses them"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["refs"] -= 1
+            if job["refs"] > 0:
+                return
+            del self._jobs[job_id]
+        shutil.rmtree(os.path.join(self.root, job_id), ignore_errors=True)
+
+    @contextlib.contextmanager
+    def hold(self, job_id: str):
+        """Keep a job's files from being evicted while it is processed or rendered"""
+        self.acquire(job_id)
+        try:
+            yield
+        finally:
+            self.release(job_id)
+
+    def path(self, job_id: str, name: str) -> str:
+        """Path for a new file in the job's directory; marks the job as recently used"""
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs.move_to_end(job_id)
+        return os.path.join(self.root, job_id, name)
+
+    def track(self, job_id: str) -> None:
+        """Account for files just written to a job and evict idle jobs if over quota"""
+        job_dir = os.path.join(self.root, job_id)
+        size = sum(entry.stat().st_size for entry in os.scandir(job_dir)) if os.path.isdir(job_dir) else 0
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id]["bytes"] = size
+        total = self._evict_idle(keep=job_id)
+        if total > self.quota_bytes:
+            logger.warning("Scratch usage %.0f MB is over quota, but every other job is still in use",
+                           total / 1024 / 1024)
+
+
+@st.cache_resource
+def get_scratch() -> ScratchSpace:
+    """Scratch space shared by every session; created (and swept) once per server process"""
+    return ScratchSpace(SCRATCH_ROOT, SCRATCH_QUOTA_BYTES, SCRATCH_ORPHAN_AGE)
+
+
+class ScratchLease:
+    """A session's hold on one scratch job, released explicitly or when the session goes away"""
+
+    def __init__(self, scratch: ScratchSpace, job_id: str):
+        self.job_id = job_id
+        # Streamlit has no session-end hook, but session state is garbage collected with the session
+        self._finalizer = weakref.finalize(self, scratch.release, job_id)
+
+    def release(self) -> None:
+        self._finalizer()
+
+
+def start_scratch_job() -> str:
+    """Start a new scratch job for this session, releasing the files of its previous job"""
+    if st.session_state.get("scratch_lease"):
+        st.session_state.scratch_lease.release()
+    scratch = get_scratch()
+    job_id = scratch.create_job()
+    st.session_state.scratch_lease = ScratchLease(scratch, job_id)
+    return job_id
+
+
+# Threads doing a profiled job's work, by thread ident: the job's own thread while its
+# SamplingProfiler runs, and pool workers while they run a task wrapped by job_task. A profile
+# only samples its job's threads, so other jobs running at the same time stay out of it
+_job_threads: Dict[int, str] = {}
+_profiled_job: contextvars.ContextVar = contextvars.ContextVar("profiled_job", default=None)
+
+
+def job_task(fn: Callable) -> Callable:
+    """`fn`, run as part of the job being profiled on this thread, if any, when it is called on a pool worker"""
+    job_id = _profiled_job.get()
+    if job_id is None:
+        return fn
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        ident = threading.get_ident()
+        token = _profiled_job.set(job_id)
+        _job_threads[ident] = job_id
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            del _job_threads[ident]
+            _profiled_job.reset(token)
+    return run
+
+
+class SamplingProfiler:
+    """
+    Low-overhead wall-clock profiler for one job. A daemon thread wakes every `interval`
+    seconds, reads the stacks of the job's threads with sys._current_frames() and counts them:
+    the thread that entered the profiler and the pool workers running its tasks.
+    Each sample is also put in a bucket: Python on the CPU, waiting on a child process,
+    on the network, or otherwise waiting. On exit the counts are written as folded stacks
+    (`thread;outer;...;inner count`, ready for flamegraph.pl or speedscope) next to a JSON
+    summary that adds the CPU time used by this process and by its child processes (FFmpeg).
+    """
+
+    def __init__(self, job_id: str, output_dir: str, pipeline: str, interval: float = PROFILE_INTERVAL):
+        self.job_id = job_id
+        self.pipeline = pipeline
+        self.interval = interval
+        self.folded_path = os.path.join(output_dir, f"profile-{job_id}.folded")
+        self.summary_path = os.path.join(output_dir, f"profile-{job_id}.json")
+        self.stacks: Counter = Counter()
+        self.summary: Dict[str, Any] = {}
+        self._buckets: Counter = Counter()
+        self._python_leaves: Counter = Counter()
+        self._ticks = 0
+        self._labels: Dict[Any, Tuple[str, str]] = {}
+        self._thread_cpu: Dict[int, float] = {}
+        # Frames are labelled by their path relative to the sys.path entry they were imported from
+        self._prefixes = sorted({os.path.join(os.path.abspath(p), "") for p in sys.path if p}, key=len, reverse=True)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _label(self, code) -> Tuple[str, str]:
+        """Short file name and flamegraph label of a code object"""
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            for prefix in self._prefixes:
+                if filename.startswith(prefix):
+                    filename = filename[len(prefix):]
+                    break
+            label = self._labels[code] = (filename, f"{code.co_name} ({filename}:{code.co_firstlineno})")
+        return label
+
+    def _bucket(self, thread_id: int, files: List[str], alive: bool) -> str:
+        """What a sampled thread is spending its time on; files run from the innermost frame outwards"""
+        # A thread whose CPU clock moved since the last sample was running; otherwise its
+        # frames tell what it is blocked on
+        cpu = None
+        if alive and hasattr(time, "pthread_getcpuclockid"):
+            try:
+                cpu = time.clock_gettime(time.pthread_getcpuclockid(thread_id))
+            except OSError:
+                pass
+        previous = self._thread_cpu.get(thread_id)
+        self._thread_cpu[thread_id] = cpu
+        running = None if cpu is None or previous is None else cpu > previous
+        if running:
+            return "python"
+        if "subprocess.py" in files:
+            return "subprocess"
+        if any(filename in PROFILE_NETWORK_FILES or filename.startswith(PROFILE_NETWORK_PACKAGES) for filename in files):
+            return "network"
+        if running is False or files[0] in PROFILE_WAIT_FILES:
+            return "waiting"
+        return "python"
+
+    def _sample(self) -> None:
+        # One flamegraph row per kind of thread: "ThreadPoolExecutor-0_3" -> "ThreadPoolExecutor", "Thread-3 (worker)" -> "Thread (worker)"
+        names = {thread.ident: re.sub(r"[-_]\d+", "", thread.name) for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if _job_threads.get(thread_id) != self.job_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+
+            labels = [names.get(thread_id, "thread")] + [label for _, label in reversed(stack)]
+            self.stacks[";".join(labels)] += 1
+            bucket = self._bucket(thread_id, [filename for filename, _ in stack], thread_id in names)
+            self._buckets[bucket] += 1
+            if bucket == "python":
+                self._python_leaves[stack[0][1]] += 1
+        self._ticks += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    @staticmethod
+    def _cpu_usage() -> Optional[Tuple[float, float]]:
+        """CPU seconds used so far by this process and by its finished child processes"""
+        if resource is None:
+            return None
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return own.ru_utime + own.ru_stime, children.ru_utime + children.ru_stime
+
+    def __enter__(self) -> "SamplingProfiler":
+        self._job_thread = threading.get_ident()
+        _job_threads[self._job_thread] = self.job_id
+        self._job_token = _profiled_job.set(self.job_id)
+        self._start_usage = self._cpu_usage()
+        self._start = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        del _job_threads[self._job_thread]
+        _profiled_job.reset(self._job_token)
+        wall_seconds = time.perf_counter() - self._start
+        usage = self._cpu_usage()
+
+        # Sampling itself takes time, so a sample is worth the real time between ticks
+        seconds_per_sample = wall_seconds / self._ticks if self._ticks else self.interval
+        self.summary = {
+            "job_id": self.job_id,
+            "pipeline": self.pipeline,
+            "wall_seconds": round(wall_seconds, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": sum(self.stacks.values()),
+            # Process-wide, so other jobs running at the same time are included
+            "process_cpu_seconds": round(usage[0] - self._start_usage[0], 3) if usage else None,
+            "child_cpu_seconds": round(usage[1] - self._start_usage[1], 3) if usage else None,
+            "thread_seconds": {bucket: round(self._buckets[bucket] * seconds_per_sample, 3)
+                               for bucket in ("python", "subprocess", "network", "waiting")},
+            "hottest_python": [{"frame": label, "seconds": round(count * seconds_per_sample, 3)}
+                               for label, count in self._python_leaves.most_common(10)],
+        }
+        try:
+            with open(self.folded_path, "w") as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in self.stacks.items())
+            with open(self.summary_path, "w") as f:
+                json.dump(self.summary, f, indent=2)
+        except OSError as e:
+            logger.warning("Couldn't save the profile of job %s: %s", self.job_id, e)
+        logger.info("Profile of job %s: %s", self.job_id, self.describe())
+
+    def describe(self) -> str:
+        """One-line summary of where the job's time went"""
+        seconds = self.summary["thread_seconds"]
+        text = (f"{self.summary['wall_seconds']:.1f}s wall · thread time: Python {seconds['python']:.1f}s, "
+                f"subprocesses {seconds['subprocess']:.1f}s, network {seconds['network']:.1f}s, "
+                f"waiting {seconds['waiting']:.1f}s")
+        if self.summary["child_cpu_seconds"] is not None:
+            text += f" · child process CPU {self.summary['child_cpu_seconds']:.1f}s"
+        return text
+
+
+def profile_job(enabled: bool, job_id: str, output_dir: str, pipeline: str):
+    """A SamplingProfiler around the job when profiling is on, otherwise a context that does nothing"""
+    if not enabled:
+        return contextlib.nullcontext()
+    os.makedirs(output_dir, exist_ok=True)
+    return SamplingProfiler(job_id, output_dir, pipeline)
+
+
+def profile_settings() -> bool:
+    """Sidebar switch for profiling jobs started from this session (on by default with PROFILE=1)"""
+    return st.sidebar.toggle("🔬 Profile jobs", value=PROFILE_ENABLED,
+                             help="Record where each job spends its time and offer the profile for download")
+
+
+def render_profile(profiler: Optional[SamplingProfiler]) -> None:
+    """Show a profiled job's summary with a download of its folded stacks"""
+    if profiler is None or not profiler.summary:
+        return
+    st.caption(f"🔬 Profile of job {profiler.job_id}: {profiler.describe()}")
+    if os.path.exists(profiler.folded_path):
+        with open(profiler.folded_path, "rb") as file:
+            st.download_button("Download profile (folded stacks)", data=file,
+                               file_name=os.path.basename(profiler.folded_path), mime="text/plain",
+                               key=f"profile_{profiler.job_id}")
+
+
+class ClipJsonExtractor:
+    """
+    Pulls the clip list out of a LeMUR response. The text is scanned once for a JSON array
+    and its objects are decoded one at a time, so prose or code fences around the array and
+    a truncated tail don't lose the clips before them. Every object is checked against the
+    expected fields. If that check fails, LeMUR is asked once to reformat its own answer
+    (only the answer is sent, not the transcript) instead of rerunning the whole job.
+    Parse-failure and re-ask counts are kept for the whole process.
+    """
+
+    _ARRAY_START = re.compile(r"\[\s*(?=\{)")
+    _SEPARATOR = re.compile(r"\s*,?\s*")
+    _TIMESTAMP = re.compile(r"^\d+(?::\d{1,2}){0,2}(?:\.\d+)?$")
+
+    def __init__(self, fields: Dict[str, str]):
+        self.fields = fields
+        self._decoder = json.JSONDecoder()
+        self._lock = threading.Lock()
+        self.stats = {"responses": 0, "parse_failures": 0, "reasks": 0, "reask_failures": 0}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def iter_objects(self, text: str):
+        """Yield the objects of the first JSON array of objects in text, as each one is decoded"""
+        for match in self._ARRAY_START.finditer(text):
+            pos = match.end()
+            found = False
+            while pos < len(text) and text[pos] == "{":
+                try:
+                    item, pos = self._decoder.raw_decode(text, pos)
+                except json.JSONDecodeError:
+                    break
+                found = True
+                yield item
+                pos = self._SEPARATOR.match(text, pos).end()
+            if found:
+                return
+
+    def validate(self, item: Any) -> Optional[str]:
+        """Why an item doesn't match the schema, or None if it does"""
+        if not isinstance(item, dict):
+            return "not an object"
+        missing = [field for field in self.fields
+                   if not isinstance(item.get(field), (str, int, float)) or not str(item[field]).strip()]
+        if missing:
+            return f"missing or empty {', '.join(missing)}"
+        if not self._TIMESTAMP.match(str(item["timestamp"]).strip()):
+            return f"timestamp {item['timestamp']!r} is not MM:SS"
+        return None
+
+    def parse(self, text: str) -> Tuple[List[Dict[str, str]], List[str]]:
+        """Valid clips found in text, and a description of every problem"""
+        clips, problems = [], []
+        for i, item in enumerate(self.iter_objects(text or "")):
+            problem = self.validate(item)
+            if problem:
+                problems.append(f"item {i+1}: {problem}")
+            else:
+                clips.append({field: str(item[field]).strip() for field in self.fields})
+        if not clips and not problems:
+            problems.append("no JSON array of clip objects found")
+        return clips, problems
+
+    def reask_prompt(self, problems: List[str]) -> str:
+        """Prompt asking LeMUR to turn its previous answer into the expected JSON"""
+        fields = "\n".join(f'- "{field}": {description}' for field, description in self.fields.items())
+        return (
+            "The context is an answer that was supposed to be a JSON array of clips but could not be used:\n"
+            + "\n".join(f"- {problem}" for problem in problems)
+            + "\n\nRewrite it as a valid JSON array where each object has exactly these fields:\n"
+            + fields
+            + "\n\nKeep the clips and their content from the answer. Reply with the JSON array only."
+        )
+
+    def extract(self, text: str, client: "AssemblyAIClient") -> List[Dict[str, str]]:
+        """Clips from a LeMUR response, re-asking once if the response doesn't validate"""
+        self._count("responses")
+        clips, problems = self.parse(text)
+        if problems:
+            self._count("parse_failures")
+            self._count("reasks")
+            logger.warning("LeMUR clip list failed validation (%s), asking for a reformat", "; ".join(problems))
+            try:
+                reply = client.call(aai.Lemur().task, self.reask_prompt(problems), input_text=text,
+                                    final_model=aai.LemurModel.claude3_haiku)
+                fixed, fixed_problems = self.parse(reply.response)
+            except Exception as e:
+                fixed, fixed_problems = [], [str(e)]
+            if fixed_problems:
+                self._count("reask_failures")
+            if len(fixed) >= len(clips):
+                clips = fixed
+
+        with self._lock:
+            responses = self.stats["responses"]
+            logger.info("Clip parsing: parse failure rate %.0f%%, re-ask rate %.0f%%, re-ask failures %d (%s)",
+                        100 * self.stats["parse_failures"] / responses, 100 * self.stats["reasks"] / responses,
+                        self.stats["reask_failures"], self.stats)
+        return clips
+
+
+@st.cache_resource
+def get_clip_extractor() -> ClipJsonExtractor:
+    """Clip extractor shared by every session, so its metrics cover the whole process"""
+    return ClipJsonExtractor(CLIP_FIELDS)
+
+
+@functools.lru_cache(maxsize=32)
+def _file_digest(path: str, size: int, mtime_ns: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_hash(path: str) -> str:
+    """SHA-256 of a file's contents, computed once per version of the file"""
+    stat = os.stat(path)
+    return _file_digest(path, stat.st_size, stat.st_mtime_ns)
+
+
+@dataclass
+class MediaIndex:
+    """
+    Where a source can be cut cleanly, in seconds: keyframes (for seeking), scene changes
+    and silence gaps (for clip boundaries). Every lookup is a bisect over sorted lists.
+    `peaks` is the audio's waveform, one peak level (0-1) every PEAK_INTERVAL seconds.
+    """
+    duration: float
+    keyframes: List[float]
+    scenes: List[float]
+    silences: List[Tuple[float, float]]
+    peaks: List[float] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.speech_starts = [end for _, end in self.silences]
+        self.pauses = [start for start, _ in self.silences]
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"version": MEDIA_INDEX_VERSION, "duration": self.duration, "keyframes": self.keyframes,
+                "scenes": self.scenes, "silences": self.silences, "peaks": self.peaks}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "MediaIndex":
+        if data.get("version") != MEDIA_INDEX_VERSION:
+            raise ValueError("stale media index")
+        return cls(data["duration"], data["keyframes"], data["scenes"], [tuple(gap) for gap in data["silences"]],
+                   data["peaks"])
+
+    @staticmethod
+    def _nearest(times: List[float], target: float, window: float) -> Optional[float]:
+        i = bisect.bisect_left(times, target)
+        candidates = [t for t in times[max(i - 1, 0):i + 1] if abs(t - target) <= window]
+        return min(candidates, key=lambda t: abs(t - target)) if candidates else None
+
+    def keyframe_before(self, t: float) -> Optional[float]:
+        """Last keyframe at or before t, or None for sources without video"""
+        i = bisect.bisect_right(self.keyframes, t)
+        return self.keyframes[i - 1] if i else None
+
+    def snap_start(self, t: float, window: float = BOUNDARY_SNAP_SECONDS) -> float:
+        """Nearest scene change, else nearest point where speech resumes, within window of t"""
+        snapped = self._nearest(self.scenes, t, window)
+        if snapped is None:
+            snapped = self._nearest(self.speech_starts, t, window)
+        return t if snapped is None else snapped
+
+    def snap_end(self, t: float, window: float = BOUNDARY_SNAP_SECONDS) -> float:
+        """Nearest pause in speech, else nearest scene change, within window of t"""
+        snapped = self._nearest(self.pauses, t, window)
+        if snapped is None:
+            snapped = self._nearest(self.scenes, t, window)
+        return t if snapped is None else snapped
+
+    def next_boundary(self, t: float, window: float = BOUNDARY_SNAP_SECONDS) -> float:
+        """First scene change or speech start at or after t (within window), else t"""
+        candidates = []
+        for times in (self.scenes, self.speech_starts):
+            i = bisect.bisect_left(times, t)
+            if i < len(times) and times[i] - t <= window:
+                candidates.append(times[i])
+        return min(candidates, default=t)
+
+    def peaks_between(self, start: float, end: float,
+                      max_points: int = TRIM_WAVEFORM_POINTS) -> Tuple[List[float], List[float]]:
+        """Times and peak levels between start and end, merged down to at most max_points"""
+        first = max(int(start / PEAK_INTERVAL), 0)
+        last = min(int(end / PEAK_INTERVAL) + 1, len(self.peaks))
+        step = max(1, -(-(last - first) // max_points))
+        times, levels = [], []
+        for i in range(first, last, step):
+            times.append(round(i * PEAK_INTERVAL, 2))
+            levels.append(max(self.peaks[i:i + step]))
+        return times, levels
+
+    def adjust_clip(self, start: float, duration: float) -> Tuple[float, float]:
+        """Move a clip's start and end onto nearby boundaries; returns (start, duration)"""
+        start = self.snap_start(start)
+        end = self.snap_end(start + duration)
+        if end - start < duration / 2:
+            end = start + duration
+        if self.duration:
+            end = min(end, self.duration)
+        return start, max(end - start, 1.0)
+
+
+class MediaIndexer:
+    """
+    Builds MediaIndex objects in background threads right after upload. Each source gets
+    one ffprobe pass over its packets (keyframes, no decoding) and one ffmpeg decode pass
+    (scene changes, silences and waveform peaks). Results are cached on disk by content hash, so uploading
+    the same file again costs only the hash.
+    """
+
+    _METADATA_TIME = re.compile(r"Parsed_metadata.*pts_time:(\d+(?:\.\d+)?)")
+    _SILENCE_START = re.compile(r"silence_start: (-?\d+(?:\.\d+)?)")
+    _SILENCE_END = re.compile(r"silence_end: (\d+(?:\.\d+)?)")
+    _PEAK_LEVEL = re.compile(r"lavfi\.astats\.Overall\.Peak_level=(\S+)")
+
+    def __init__(self, cache_dir: str, max_workers: int = 2):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="media-index")
+
+    def submit(self, path: str) -> Future:
+        """Start indexing a source; the future resolves to a MediaIndex, or None if analysis failed"""
+        return self._executor.submit(job_task(self.build), path)
+
+    def build(self, path: str) -> Optional[MediaIndex]:
+        try:
+            cache_path = os.path.join(self.cache_dir, f"{source_hash(path)}.json")
+            try:
+                with open(cache_path) as f:
+                    return MediaIndex.from_json(json.load(f))
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+
+            start = time.monotonic()
+            index = self.analyze(path)
+            tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(index.to_json(), f)
+            os.replace(tmp_path, cache_path)
+            logger.info("Indexed %s in %.1fs: %d keyframes, %d scene changes, %d silences", path,
+                        time.monotonic() - start, len(index.keyframes), len(index.scenes), len(index.silences))
+            return index
+        except Exception as e:
+            logger.warning("Couldn't build media index for %s: %s", path, e)
+            return None
+
+    @classmethod
+    def analyze(cls, path: str) -> MediaIndex:
+        probe = subprocess.run([
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags:format=duration", "-of", "csv=p=0", path
+        ], capture_output=True, check=True, text=True)
+        duration, keyframes = 0.0, []
+        for line in probe.stdout.splitlines():
+            fields = line.strip().split(",")
+            try:
+                if len(fields) == 1:
+                    duration = float(fields[0])
+                elif "K" in fields[1]:
+                    keyframes.append(float(fields[0]))
+            except ValueError:
+                continue
+
+        scan = subprocess.run([
+            "ffmpeg", "-hide_banner", "-nostats", "-i", path,
+            "-vf", f"scale=160:-2,select='gt(scene,{SCENE_THRESHOLD})',metadata=print",
+            "-af", f"silencedetect=noise={SILENCE_NOISE}:d={SILENCE_MIN_SECONDS},"
+                   f"aresample={PEAK_SAMPLE_RATE},asetnsamples=n={int(PEAK_SAMPLE_RATE * PEAK_INTERVAL)}:p=0,"
+                   "astats=metadata=1:reset=1,ametadata=print:key=lavfi.astats.Overall.Peak_level",
+            "-f", "null", "-"
+        ], capture_output=True, check=True, text=True, errors="replace")
+        scenes, silences, peaks, silence_start = [], [], [], None
+        for line in scan.stderr.splitlines():
+            if match := cls._PEAK_LEVEL.search(line):
+                # dB relative to full scale; -inf for digital silence
+                peaks.append(round(min(10 ** (float(match.group(1)) / 20), 1.0), 3))
+            elif match := cls._METADATA_TIME.search(line):
+                scenes.append(float(match.group(1)))
+            elif match := cls._SILENCE_START.search(line):
+                silence_start = max(float(match.group(1)), 0.0)
+            elif (match := cls._SILENCE_END.search(line)) and silence_start is not None:
+                silences.append((silence_start, float(match.group(1))))
+                silence_start = None
+        if silence_start is not None and duration:
+            silences.append((silence_start, duration))
+
+        return MediaIndex(duration, sorted(keyframes), sorted(scenes), sorted(silences), peaks)
+
+
+@st.cache_resource
+def get_media_indexer() -> MediaIndexer:
+    """Media indexer shared by every session of this server process"""
+    return MediaIndexer(MEDIA_INDEX_DIR)
+
+
+def ready_media_index(future: Optional[Future]) -> Optional[MediaIndex]:
+    """The source's media index if it has been built already, without waiting"""
+    if future is None or not future.done():
+        return None
+    return future.result()
+
+
+class WordIndex:
+    """Word timings of a transcript in seconds, for transcript lookups while trimming"""
+
+    def __init__(self, words: List):
+        self.starts = [w.start / 1000 for w in words]
+        self.ends = [w.end / 1000 for w in words]
+        self.texts = [w.text for w in words]
+
+    def text_between(self, start: float, end: float) -> str:
+        """Words that start inside [start, end)"""
+        return " ".join(self.texts[bisect.bisect_left(self.starts, start):bisect.bisect_left(self.starts, end)])
+
+    def word_at(self, t: float) -> Optional[str]:
+        """The word being spoken at t, if any"""
+        i = bisect.bisect_right(self.starts, t) - 1
+        return self.texts[i] if i >= 0 and t < self.ends[i] else None
+
+
+def render_trim_control(i: int, start: float, duration: float, source_duration: Optional[float],
+                        media_index: Optional[MediaIndex], word_index: WordIndex,
+                        key_prefix: str) -> Optional[Tuple[float, float]]:
+    """
+    Start/end slider for one clip, with the waveform around it and the words it would contain.
+    Dragging only reads the cached peaks and word timings; FFmpeg isn't involved.
+    
+    Returns:
+        The new (start, duration) when the user confirms it, else None
+    """
+    end = start + duration
+    window_start = max(0.0, start - TRIM_MARGIN_SECONDS)
+    window_end = end + TRIM_MARGIN_SECONDS
+    if source_duration:
+        window_end = max(min(window_end, source_duration), end)
+    
+    with st.expander(f"✂️ Trim clip {i+1}"):
+        new_start, new_end = st.slider(
+            "Start and end (seconds)", float(window_start), float(window_end), (float(start), float(end)),
+            step=0.1, format="%.1f", key=f"{key_prefix}_trim_{i}"
+        )
+        
+        if media_index and media_index.peaks:
+            times, levels = media_index.peaks_between(window_start, window_end)
+            st.area_chart({
+                "seconds": times,
+                "clip": [level if new_start <= t <= new_end else 0.0 for t, level in zip(times, levels)],
+                "trimmed": [0.0 if new_start <= t <= new_end else level for t, level in zip(times, levels)],
+            }, x="seconds", y=["clip", "trimmed"], height=120)
+        
+        st.caption(f"{int(new_start // 60):02d}:{new_start % 60:04.1f} to {int(new_end // 60):02d}:{new_end % 60:04.1f} "
+                   f"({new_end - new_start:.1f}s)")
+        cut_words = [word for word in (word_index.word_at(new_start), word_index.word_at(new_end)) if word]
+        if cut_words:
+            st.warning(f"Cuts through a word: {', '.join(cut_words)}")
+        st.write(word_index.text_between(new_start, new_end) or "_No speech in this range_")
+        
+        unchanged = abs(new_start - start) < 0.05 and abs(new_end - end) < 0.05
+        if st.button("Render trimmed clip", key=f"{key_prefix}_trim_render_{i}", disabled=unchanged):
+            return new_start, new_end - new_start
+    return None
+
+
+@dataclass
+class Mezzanine:
+    """A source cut into short segments that each start on a keyframe: (file, start, end) in seconds"""
+    directory: str
+    segments: List[Tuple[str, float, float]]
+
+    def assemble(self, start: float, duration: float, output_path: str) -> None:
+        """
+        Write the clip [start, start + duration) to output_path with the concat demuxer.
+        Segments fully inside the clip are copied as they are; only the partial first and
+        last segments are encoded. Raises subprocess.SubprocessError if FFmpeg fails.
+        """
+        end = start + duration
+        starts = [segment_start for _, segment_start, _ in self.segments]
+        first = max(bisect.bisect_right(starts, start) - 1, 0)
+        last = max(bisect.bisect_left(starts, end) - 1, first)
+        base = os.path.splitext(output_path)[0]
+        list_path = f"{base}.concat.txt"
+        parts, temp_files = [], [list_path]
+        try:
+            for i in range(first, last + 1):
+                name, segment_start, segment_end = self.segments[i]
+                segment_path = os.path.join(self.directory, name)
+                cut_in = max(start - segment_start, 0.0)
+                cut_out = min(end, segment_end) - segment_start
+                if cut_in < 0.001 and cut_out > segment_end - segment_start - 0.001:
+                    parts.append(segment_path)
+                    continue
+                part_path = f"{base}.part{i}.mp4"
+                temp_files.append(part_path)
+                subprocess.run([
+                    "ffmpeg", "-v", "error", "-ss", f"{cut_in:.3f}", "-i", segment_path,
+                    "-t", f"{cut_out - cut_in:.3f}", *MEZZANINE_ENCODE, "-y", part_path
+                ], capture_output=True, check=True)
+                parts.append(part_path)
+
+            if len(parts) == 1 and parts[0] in temp_files:
+                os.replace(parts[0], output_path)
+                return
+            with open(list_path, "w") as f:
+                for part in parts:
+                    f.write("file '{}'\n".format(part.replace("'", "'\\''")))
+            subprocess.run([
+                "ffmpeg", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+                "-c", "copy", "-movflags", "+faststart", "-y", output_path
+            ], capture_output=True, check=True)
+        finally:
+            for path in temp_files:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+class MezzanineStore:
+    """
+    Optional ingest step: each source is transcoded once, in the background, into
+    `segment_seconds`-long segments with a keyframe at the start of each, plus a CSV
+    segment index. Segments are stored by content hash, so clipping the same file again
+    later is mostly copying. The least recently used sources are evicted above `quota_bytes`.
+    """
+
+    INDEX_NAME = "segments.csv"
+
+    def __init__(self, root: str, segment_seconds: float, quota_bytes: int, max_workers: int = 1):
+        self.root = root
+        self.segment_seconds = segment_seconds
+        self.quota_bytes = quota_bytes
+        os.makedirs(root, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mezzanine")
+
+    def submit(self, path: str) -> Future:
+        """Start ingesting a source; the future resolves to a Mezzanine, or None if ingest failed"""
+        return self._executor.submit(job_task(self.build), path)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional[Mezzanine]:
+        try:
+            with open(os.path.join(directory, cls.INDEX_NAME)) as f:
+                rows = [line.strip().rsplit(",", 2) for line in f if line.strip()]
+            return Mezzanine(directory, [(name, float(start), float(end)) for name, start, end in rows])
+        except (OSError, ValueError):
+            return None
+
+    def build(self, path: str) -> Optional[Mezzanine]:
+        directory = os.path.join(self.root, source_hash(path))
+        mezzanine = self.load(directory)
+        if mezzanine:
+            os.utime(directory)
+            return mezzanine
+
+        tmp_dir = f"{directory}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(tmp_dir)
+            start = time.monotonic()
+            subprocess.run([
+                "ffmpeg", "-v", "error", "-i", path, *MEZZANINE_ENCODE,
+                "-force_key_frames", f"expr:gte(t,n_forced*{self.segment_seconds})",
+                "-f", "segment", "-segment_time", str(self.segment_seconds), "-reset_timestamps", "1",
+                "-segment_list", os.path.join(tmp_dir, self.INDEX_NAME), "-segment_list_type", "csv",
+                os.path.join(tmp_dir, "seg_%05d.mp4")
+            ], capture_output=True, check=True)
+            try:
+                os.replace(tmp_dir, directory)
+            except OSError:
+                # Another session ingested the same file first
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            logger.info("Ingested %s into mezzanine segments in %.1fs", path, time.monotonic() - start)
+            self.evict(keep=directory)
+            return self.load(directory)
+        except Exception as e:
+            logger.warning("Couldn't build mezzanine segments for %s: %s", path, e)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return None
+
+    def evict(self, keep: str) -> None:
+        """Delete the least recently used sources until the store fits in its quota"""
+        sources = []
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and not entry.name.endswith(".tmp"):
+                size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                sources.append((entry.stat().st_mtime, entry.path, size))
+        total = sum(size for _, _, size in sources)
+        for _, directory, size in sorted(sources):
+            if total <= self.quota_bytes:
+                break
+            if directory == keep:
+                continue
+            shutil.rmtree(directory, ignore_errors=True)
+            total -= size
+
+
+@st.cache_resource
+def get_mezzanine_store() -> MezzanineStore:
+    """Mezzanine store shared by every session of this server process"""
+    return MezzanineStore(MEZZANINE_DIR, MEZZANINE_SEGMENT_SECONDS, MEZZANINE_QUOTA_BYTES)
+
+
+def ready_mezzanine(future: Optional[Future]) -> Optional[Mezzanine]:
+    """The source's mezzanine segments if ingest has already finished (clips never wait for it)"""
+    if future is None or not future.done():
+        return None
+    return future.result()
+
 
 def parse_timestamp(timestamp: str) -> float:
     """Convert a timestamp string (HH:MM:SS) to seconds"""
@@ -49,48 +1199,112 @@ def parse_timestamp(timestamp: str) -> float:
         return 0
 
 
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a piece of text (about 4 characters per token for English)"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def plan_lemur_task(prompt: str, context_text: str, default_model: aai.LemurModel,
+                    fast_model: aai.LemurModel = aai.LemurModel.claude3_haiku) -> Tuple[str, aai.LemurModel]:
+    """
+    Assemble a LeMUR task prompt and choose its model tier.
+    
+    LeMUR already sends the transcript (or input text) as context, so a copy of it pasted
+    into the prompt as a TRANSCRIPT_BLOCK is removed before the request goes out. Other
+    occurrences of the same text (say, a short utterance repeated in a list of earlier
+    requests) are left alone. Requests whose
+    context + prompt fit within LEMUR_FAST_TOKEN_BUDGET use the fast tier; everything
+    else uses the app's default model. The decision is logged for every call.
+    """
+    prompt = prompt.strip()
+    context_text = context_text or ""
+    duplicated_tokens = 0
+    pasted_block = TRANSCRIPT_BLOCK.format(context_text)
+    if context_text and pasted_block in prompt:
+        duplicated_tokens = estimate_tokens(pasted_block)
+        prompt = prompt.replace(pasted_block, "(see the transcript provided as context)")
+    
+    context_tokens = estimate_tokens(context_text)
+    prompt_tokens = estimate_tokens(prompt)
+    total_tokens = context_tokens + prompt_tokens
+    model = fast_model if total_tokens <= LEMUR_FAST_TOKEN_BUDGET else default_model
+    logger.info(
+        "LeMUR budget: context=%d prompt=%d total=%d tokens (removed %d duplicated), budget=%d -> %s",
+        context_tokens, prompt_tokens, total_tokens, duplicated_tokens, LEMUR_FAST_TOKEN_BUDGET, model.value
+    )
+    return prompt, model
+
+
+def get_media_duration(file_path: str) -> Optional[float]:
+    """Duration of an audio/video file in seconds using ffprobe, or None if unknown"""
+    cmd = [
+        "ffprobe", "-v", "error", "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1", file_path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, check=True, text=True)
+        return float(result.stdout.strip())
+    except (subprocess.SubprocessError, FileNotFoundError, ValueError):
+        return None
+
+
 def get_highlights(audio_file: str, num_clips: int = 3, clip_duration: int = 60) -> Tuple[str, List, str]:
     """Extract the most interesting clips from the podcast using AssemblyAI"""
-    transcriber = aai.Transcriber()
+    client = get_client()
     
     with st.status("Transcribing podcast...") as status:
-        transcript = transcriber.transcribe(audio_file)
+        transcript = client.transcribe(audio_file, audio_seconds=get_media_duration(audio_file),
+                                       webhook=get_webhook_receiver())
         status.update(label="Finding the most engaging moments...")
         
-        # Use LeMUR to find the most interesting parts
+        # Use LeMUR to find the most interesting parts, as JSON
+        clip_fields = "\n".join(f'        - "{field}": {description}' for field, description in CLIP_FIELDS.items())
         highlights_prompt = f"""
         Find the {num_clips} most interesting, quotable, or 'clip-worthy' segments in this podcast.
         Each segment should be around {clip_duration} seconds long and be able to stand alone as an engaging clip.
-        For each segment, provide:
-        1. The timestamp where the clip should start
-        2. A catchy title for the clip (60 characters max)
-        3. A one-sentence summary of why this clip is interesting
+        
+        Format your response as a valid JSON array, where each object has these exact fields:
+{clip_fields}
         
         Only include segments that would be engaging out of context and make viewers want to share the clip.
         """
         
-        highlights = transcript.lemur.task(
-            highlights_prompt,
-            final_model=aai.LemurModel.claude3_haiku
-        )
+        prompt, model = plan_lemur_task(highlights_prompt, transcript.text, aai.LemurModel.claude3_haiku)
+        highlights = client.call(transcript.lemur.task, prompt, final_model=model)
         
         words = transcript.words
         
         return highlights.response, words, transcript.text
 
 
-def create_clip(video_file: str, start_time: str, duration: int, title: str, words: List) -> str:
-    """Create a short clip using FFmpeg (no ImageMagick required)"""
-    start_seconds = parse_timestamp(start_time)
+def create_clip(video_file: str, start_seconds: float, duration: float, title: str, words: List, job_id: str,
+                media_index: Optional[MediaIndex] = None, mezzanine: Optional[Mezzanine] = None) -> str:
+    """
+    Create a short clip using FFmpeg (no ImageMagick required). With mezzanine segments only
+    the clip's edges are encoded; otherwise FFmpeg seeks via the keyframe index if there is one.
+    """
+    scratch = get_scratch()
+    output_path = scratch.path(job_id, f"clip_{start_seconds:.2f}_{duration:.2f}.mp4")
+    
+    if mezzanine:
+        try:
+            mezzanine.assemble(start_seconds, duration, output_path)
+            return output_path
+        except (subprocess.SubprocessError, OSError) as e:
+            logger.warning("Mezzanine assembly failed (%s), encoding the clip from the source", e)
+        finally:
+            scratch.track(job_id)
     
-    with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as tmp:
-        output_path = tmp.name
+    keyframe = media_index.keyframe_before(start_seconds) if media_index else None
+    if keyframe is not None:
+        seek = ["-ss", str(keyframe), "-i", video_file, "-ss", f"{start_seconds - keyframe:.3f}"]
+    else:
+        seek = ["-i", video_file, "-ss", str(start_seconds)]
     
     try:
         cmd = [
-            "ffmpeg", "-i", video_file,
-            "-ss", str(start_seconds),
-            "-t", str(duration),
+            "ffmpeg", *seek,
+            "-t", f"{duration:.3f}",
             "-c:v", "libx264", "-c:a", "aac",
             "-strict", "experimental",
             "-b:a", "192k",
@@ -103,6 +1317,8 @@ def create_clip(video_file: str, start_time: str, duration: int, title: str, wor
         st.error(f"Error creating clip: {e}")
         shutil.copy(video_file, output_path)
         return output_path
+    finally:
+        scratch.track(job_id)
 
 
 def check_ffmpeg_installed() -> bool:
@@ -115,83 +1331,100 @@ def check_ffmpeg_installed() -> bool:
         return False
 
 
-def extract_clip_info(sections: List[str]) -> List[Dict[str, str]]:
-    """Extract clip information from the highlights text"""
-    clips_info = []
+def extract_clip_info(highlights: str) -> List[Dict[str, str]]:
+    """Extract clip information from the highlights JSON, asking LeMUR once to fix it if it doesn't validate"""
+    return get_clip_extractor().extract(highlights, get_client())
+
+
+def render_clip(i: int, clip: Dict[str, Any]) -> bool:
+    """Render one clip with FFmpeg unless it's already on disk; False if the upload itself is gone"""
+    if clip["clip_path"] and os.path.exists(clip["clip_path"]):
+        return True
+    if not os.path.exists(st.session_state.temp_path):
+        return False
+    with st.spinner(f"Rendering clip {i+1}..."):
+        clip["clip_path"] = create_clip(
+            st.session_state.temp_path, clip["start_seconds"], clip["duration"], clip["title"],
+            st.session_state.words, st.session_state.scratch_lease.job_id,
+            ready_media_index(st.session_state.index_future), ready_mezzanine(st.session_state.mezzanine_future)
+        )
+    return True
+
+
+def display_clips() -> None:
+    """Display the clips (rendering any that aren't yet) or transcript excerpts, each with a trim control"""
+    st.markdown("## 🔥 Your Viral Clips")
+    st.text_area("Full analysis", st.session_state.highlights, height=200)
+    if not st.session_state.clips:
+        st.warning("Couldn't find any clips in the analysis above.")
     
-    for section in sections:
-        if not section.strip():
-            continue
+    for i, clip in enumerate(st.session_state.clips):
+        st.markdown(f"### Clip {i+1}: {clip['title']}")
+        if clip["summary"]:
+            st.markdown(f"*{clip['summary']}*")
         
-        lines = section.strip().split("\n")
-        if len(lines) >= 2:
-            timestamp_line = [l for l in lines if ":" in l and ("start" in l.lower() or "timestamp" in l.lower())]
-            title_line = [l for l in lines if "title" in l.lower() or ":" in l]
-            summary_line = [l for l in lines if "summary" in l.lower() or "why" in l.lower()]
-            
-            if timestamp_line and title_line:
-                timestamp = timestamp_line[0].split(":", 1)[1].strip()
-                title = title_line[0].split(":", 1)[1].strip()
-                summary = ""
-                if summary_line:
-                    summary = summary_line[0].split(":", 1)[1].strip() if ":" in summary_line[0] else summary_line[0]
-                
-                clips_info.append({
-                    "timestamp": timestamp,
-                    "title": title,
-                    "summary": summary
-                })
-    
-    return clips_info
-
-
-def display_clips(temp_path: str, clips_info: List[Dict[str, str]], clip_duration: int, 
-                  ffmpeg_installed: bool, words: List) -> None:
-    """Display the generated clips or transcript excerpts"""
-    
-    for i, clip_info in enumerate(clips_info):
-        timestamp = clip_info["timestamp"]
-        title = clip_info["title"]
-        summary = clip_info["summary"]
-        
-        st.markdown(f"### Clip {i+1}: {title}")
-        if summary:
-            st.markdown(f"*{summary}*")
-        
-        if ffmpeg_installed:
-            clip_path = create_clip(temp_path, timestamp, clip_duration, title, words)
-            st.video(clip_path)
+        # The index may finish while earlier clips render; clips already rendered or trimmed keep their cut
+        media_index = ready_media_index(st.session_state.index_future)
+        if media_index and not clip["snapped"] and not clip["clip_path"]:
+            clip["start_seconds"], clip["duration"] = media_index.adjust_clip(clip["start_seconds"], clip["duration"])
+            clip["snapped"] = True
+        
+        trim = render_trim_control(i, clip["start_seconds"], clip["duration"], st.session_state.source_duration,
+                                   media_index, st.session_state.word_index, st.session_state.scratch_lease.job_id)
+        if trim:
+            # Only the confirmed boundaries are rendered
+            clip["start_seconds"], clip["duration"] = trim
+            clip["clip_path"] = None
+            clip["snapped"] = True
+        
+        start_seconds, duration = clip["start_seconds"], clip["duration"]
+        if st.session_state.ffmpeg_installed:
+            if not render_clip(i, clip):
+                st.warning("This upload was cleaned up to free disk space. Please generate the clips again.")
+                break
+            st.video(clip["clip_path"])
             
-            with open(clip_path, "rb") as file:
+            with open(clip["clip_path"], "rb") as file:
                 st.download_button(
                     label=f"Download Clip {i+1}",
                     data=file,
                     file_name=f"viral_clip_{i+1}.mp4",
-                    mime="video/mp4"
+                    mime="video/mp4",
+                    key=f"download_{i}"
                 )
         else:
-            start_seconds = parse_timestamp(timestamp)
-            st.info(f"Start time: {timestamp} (Would create a {clip_duration}s clip)")
+            st.info(f"Start time: {int(start_seconds // 60):02d}:{start_seconds % 60:04.1f} "
+                    f"(Would create a {duration:.0f}s clip)")
             
-            clip_transcript = " ".join([w.text for w in words 
-                                      if start_seconds <= w.start/1000 <= start_seconds + clip_duration])
+            clip_transcript = st.session_state.word_index.text_between(start_seconds, start_seconds + duration)
             st.text_area(f"Clip {i+1} Transcript", clip_transcript, height=100)
 
 
-def process_podcast(file_path: str, num_clips: int, clip_duration: int) -> None:
-    """Process a podcast file to find and extract interesting clips."""
+def process_podcast(file_path: str, num_clips: int, clip_duration: int,
+                    index_future: Optional[Future] = None, mezzanine_future: Optional[Future] = None) -> None:
+    """Process a podcast file to find interesting clips; display_clips shows and renders them."""
+    st.session_state.clips = None
     ffmpeg_installed = check_ffmpeg_installed()
     
     try:
         highlights, words, full_transcript = get_highlights(file_path, num_clips, clip_duration)
+        clips_info = extract_clip_info(highlights)
         
-        st.markdown("## 🔥 Your Viral Clips")
-        st.text_area("Full analysis", highlights, height=200)
-        
-        sections = highlights.split("\n\n")
-        clips_info = extract_clip_info(sections)
+        # Clips start out at LeMUR's timestamps; display_clips moves them onto nearby pauses and
+        # scene changes once the media index is ready, so nothing waits for it here
+        clips = [{**clip_info, "start_seconds": parse_timestamp(clip_info["timestamp"]), "duration": clip_duration,
+                  "clip_path": None, "snapped": False} for clip_info in clips_info]
+        media_index = ready_media_index(index_future)
         
-        display_clips(file_path, clips_info, clip_duration, ffmpeg_installed, words)
+        st.session_state.temp_path = file_path
+        st.session_state.ffmpeg_installed = ffmpeg_installed
+        st.session_state.index_future = index_future
+        st.session_state.mezzanine_future = mezzanine_future
+        st.session_state.source_duration = media_index.duration if media_index else get_media_duration(file_path)
+        st.session_state.highlights = highlights
+        st.session_state.words = words
+        st.session_state.word_index = WordIndex(words)
+        st.session_state.clips = clips
         
     except Exception as e:
         st.error(f"Error processing podcast: {str(e)}")
@@ -204,6 +1437,7 @@ def main() -> None:
     st.title("🎙️ PodcastClipper")
     st.subheader("Turn podcasts into viral short clips")
     
+    profiling = profile_settings()
     uploaded_file = st.file_uploader("Upload podcast audio or video file", type=["mp3", "mp4", "wav", "m4a"])
     
     col1, col2 = st.columns(2)
@@ -213,16 +1447,39 @@ def main() -> None:
         clip_duration = st.slider("Clip duration (seconds)", 30, 120, 60)
     
     if uploaded_file and st.button("✨ Generate Viral Clips"):
-        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(uploaded_file.name).suffix) as tmp:
+        # Each run gets a fresh scratch job; the previous one is freed, and this one lives
+        # as long as the session so clips can be trimmed and rendered again later
+        try:
+            job_id = start_scratch_job()
+        except ScratchFullError as e:
+            st.error(str(e))
+            st.stop()
+        scratch = get_scratch()
+        temp_path = scratch.path(job_id, f"source{Path(uploaded_file.name).suffix}")
+        with open(temp_path, "wb") as tmp:
             tmp.write(uploaded_file.getvalue())
-            temp_path = tmp.name
+        scratch.track(job_id)
         
-        process_podcast(temp_path, num_clips, clip_duration)
-        
-        try:
-            os.remove(temp_path)
-        except OSError:
-            pass
+        # Clips are rendered by display_clips, so the profile and the hold on the job's files cover both
+        # steps; indexing and ingest start inside the profile so their workers count towards this job
+        with scratch.hold(job_id), profile_job(profiling, job_id, PROFILE_DIR, "process_podcast") as profiler:
+            # Find keyframes, scene changes and silences while the podcast is being transcribed
+            index_future = get_media_indexer().submit(temp_path)
+            mezzanine_future = None
+            if MEZZANINE_ENABLED:
+                # Keep the upload around until ingest has read it, even if the job finishes first
+                scratch.acquire(job_id)
+                mezzanine_future = get_mezzanine_store().submit(temp_path)
+                mezzanine_future.add_done_callback(lambda _, job_id=job_id: scratch.release(job_id))
+            
+            process_podcast(temp_path, num_clips, clip_duration, index_future, mezzanine_future)
+            if st.session_state.clips is not None:
+                display_clips()
+        render_profile(profiler)
+    elif st.session_state.get("clips") is not None:
+        # Clips may be rendered (or re-trimmed) on this rerun, so keep the job's files in place
+        with get_scratch().hold(st.session_state.scratch_lease.job_id):
+            display_clips()
     
     st.markdown("""
     ---
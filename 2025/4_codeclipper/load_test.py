@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Load test for CodeClipper
+Drives N concurrent headless sessions of main.py through upload -> process -> download and
+reports how latency, memory and FFmpeg CPU change as N grows. Sessions run in Streamlit's
+AppTest threads inside one process, so they share the app's cached resources like users of
+one server do, against a local stand-in for the AssemblyAI API. The media is synthetic and
+generated by FFmpeg, so no API key or real footage is needed.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+STAGES = ["load", "upload", "process", "download"]
+PERCENTILES = [50, 95, 99]
+
+# Synthetic transcript: words per second of media and the vocabulary they cycle through
+WORDS_PER_SECOND = 2.5
+VOCABULARY = ("so here we define a function that takes a list and returns the sorted result "
+              "now let's write a test for it and run the code").split()
+
+
+class FakeAssemblyAI:
+    """
+    Minimal local stand-in for the AssemblyAI endpoints the app uses: upload, transcript
+    create/get and LeMUR task. Transcripts complete `transcribe_seconds` after they are
+    created and every LeMUR call takes `lemur_seconds`, so API latency stays fixed while
+    the app's own work is measured.
+    """
+
+    def __init__(self, media_seconds: float, transcribe_seconds: float, lemur_seconds: float):
+        self.media_seconds = media_seconds
+        self.transcribe_seconds = transcribe_seconds
+        self.lemur_seconds = lemur_seconds
+        self._created = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def shutdown(self) -> None:
+        self.server.shutdown()
+
+    def words(self) -> list:
+        count = int(self.media_seconds * WORDS_PER_SECOND)
+        step = 1000 / WORDS_PER_SECOND
+        return [{"text": VOCABULARY[i % len(VOCABULARY)], "start": int(i * step), "end": int(i * step + step * 0.8),
+                 "confidence": 0.99} for i in range(count)]
+
+    def transcript(self, transcript_id: str) -> dict:
+        with self._lock:
+            created = self._created.get(transcript_id, 0.0)
+        done = time.monotonic() - created >= self.transcribe_seconds
+        body = {"id": transcript_id, "status": "completed" if done else "processing",
+                "audio_url": f"{self.url}/files/{transcript_id}"}
+        if done:
+            words = self.words()
+            body.update(text=" ".join(w["text"] for w in words), words=words,
+                        audio_duration=int(self.media_seconds), confidence=0.99)
+        return body
+
+    def clips(self) -> str:
+        """A LeMUR answer listing three clips spread over the media"""
+        clips = []
+        for i in range(3):
+            start = int(self.media_seconds * (i + 0.5) / 4)
+            clips.append({"timestamp": f"{start // 60:02d}:{start % 60:02d}", "title": f"Concept {i + 1}",
+                          "technology": "Python", "summary": "What the code in this part does."})
+        return json.dumps(clips)
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def read_body(self) -> bytes:
+                if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                    body = b""
+                    while True:
+                        size = int(self.rfile.readline().split(b";")[0], 16)
+                        if size == 0:
+                            self.rfile.readline()
+                            return body
+                        body += self.rfile.read(size)
+                        self.rfile.readline()
+                return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            def reply(self, body: dict) -> None:
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                self.read_body()
+                if self.path == "/v2/upload":
+                    self.reply({"upload_url": f"{api.url}/files/{uuid.uuid4().hex}"})
+                elif self.path == "/v2/transcript":
+                    transcript_id = uuid.uuid4().hex
+                    with api._lock:
+                        api._created[transcript_id] = time.monotonic()
+                    self.reply(api.transcript(transcript_id))
+                elif self.path == "/lemur/v3/generate/task":
+                    time.sleep(api.lemur_seconds)
+                    self.reply({"request_id": uuid.uuid4().hex, "response": api.clips(),
+                                "usage": {"input_tokens": 1000, "output_tokens": 200}})
+                else:
+                    self.send_error(404)
+
+            def do_GET(self):
+                if self.path.startswith("/v2/transcript/"):
+                    self.reply(api.transcript(self.path.rsplit("/", 1)[1]))
+                else:
+                    self.send_error(404)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def make_media(path: str, seconds: float) -> None:
+    """Synthetic tutorial video: a moving test pattern with a tone that pauses every 10 seconds"""
+    subprocess.run([
+        "ffmpeg", "-v", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size=640x360:rate=25:duration={seconds}",
+        "-f", "lavfi", "-i", f"aevalsrc='0.5*sin(440*2*PI*t)*lt(mod(t,10),8)':s=44100:d={seconds}",
+        "-c:v", "libx264", "-preset", "veryfast", "-c:a", "aac", "-shortest", path
+    ], check=True)
+
+
+def session_media(media_path: str, session: int, out_dir: str) -> str:
+    """A copy of the media with its own content hash, so sessions don't share cached indexes"""
+    name, extension = os.path.splitext(os.path.basename(media_path))
+    path = os.path.join(out_dir, f"{name}_{session}{extension}")
+    subprocess.run(["ffmpeg", "-v", "error", "-y", "-i", media_path, "-c", "copy",
+                    "-metadata", f"comment=session {session}", path], check=True)
+    return path
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+def run_session(AppTest, media_path: str, timeout: float, start_gate: threading.Barrier) -> dict:
+    """One user: open the app, upload the video, extract clips and download the first one"""
+    timings, error = {}, None
+    try:
+        at = AppTest.from_file(MAIN, default_timeout=timeout)
+        start_gate.wait()
+        start = time.monotonic()
+        at.run()
+        timings["load"] = time.monotonic() - start
+
+        with open(media_path, "rb") as f:
+            at.file_uploader[0].set_value(("tutorial.mp4", f.read(), "video/mp4"))
+        start = time.monotonic()
+        at.run()
+        timings["upload"] = time.monotonic() - start
+
+        start = time.monotonic()
+        at.button(key="extract_button").click().run()
+        timings["process"] = time.monotonic() - start
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+
+        downloads = at.get("download_button")
+        if not downloads:
+            raise RuntimeError("no clips to download: " + "; ".join(e.value for e in at.error))
+        start = time.monotonic()
+        downloads[0].click().run()
+        timings["download"] = time.monotonic() - start
+    except Exception as e:
+        error = str(e)
+    return {"timings": timings, "error": error}
+
+
+def run_instance(media_paths: list, api_url: str, work_dir: str, timeout: float, results) -> None:
+    """
+    One app instance: every session runs in a thread of this process, so they share the
+    cached client, scratch space and FFmpeg worker pools just like users of one
+    `streamlit run` server do. Reports the sessions plus this process's memory and CPU.
+    """
+    os.environ.update({
+        "ASSEMBLYAI_API_KEY": "load-test",
+        "SCRATCH_DIR": os.path.join(work_dir, "scratch"),
+        "MEDIA_INDEX_DIR": os.path.join(work_dir, "index"),
+        "MEZZANINE_DIR": os.path.join(work_dir, "mezzanine"),
+    })
+    import assemblyai as aai
+    from streamlit.testing.v1 import AppTest
+
+    aai.settings.base_url = api_url
+    # Load the app once so the baseline includes the server's own imports and shared resources
+    AppTest.from_file(MAIN, default_timeout=timeout).run()
+    baseline_rss = rss_mb()
+    start_usage = resource.getrusage(resource.RUSAGE_SELF)
+
+    reports = [None] * len(media_paths)
+    start_gate = threading.Barrier(len(media_paths))
+
+    def session(i: int) -> None:
+        reports[i] = run_session(AppTest, media_paths[i], timeout, start_gate)
+
+    threads = [threading.Thread(target=session, args=(i,), daemon=True) for i in range(len(media_paths))]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(max(0.0, timeout * len(STAGES) - (time.monotonic() - start)))
+    wall = time.monotonic() - start
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    results.put({
+        "reports": [report or {"timings": {}, "error": "session timed out"} for report in reports],
+        "wall_s": wall,
+        "baseline_rss_mb": baseline_rss,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": usage.ru_maxrss / 1024,
+        "app_cpu_s": usage.ru_utime + usage.ru_stime - start_usage.ru_utime - start_usage.ru_stime,
+        "ffmpeg_cpu_s": children.ru_utime + children.ru_stime,
+    })
+    # Session threads that timed out may still be running, so flush the result and exit without waiting
+    results.close()
+    results.join_thread()
+    os._exit(0)
+
+
+def percentile(values: list, p: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))]
+
+
+def run_level(sessions: int, media_path: str, api_url: str, work_dir: str, timeout: float) -> dict:
+    """Start `sessions` users at once on a fresh app instance and wait for all of them"""
+    level_dir = os.path.join(work_dir, f"level_{sessions}")
+    os.makedirs(level_dir)
+    media_paths = [session_media(media_path, i, level_dir) for i in range(sessions)]
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    instance = context.Process(target=run_instance, args=(media_paths, api_url, level_dir, timeout, results))
+    start = time.monotonic()
+    instance.start()
+    try:
+        run = results.get(timeout=timeout * (len(STAGES) + 1))
+    except queue.Empty:
+        run = {"reports": [{"timings": {}, "error": "app instance crashed or timed out"}] * sessions,
+               "wall_s": time.monotonic() - start, "baseline_rss_mb": 0.0, "peak_rss_mb": 0.0,
+               "app_cpu_s": 0.0, "ffmpeg_cpu_s": 0.0}
+    instance.join(30)
+    if instance.is_alive():
+        instance.kill()
+
+    reports, wall = run["reports"], run["wall_s"]
+    ok = [report for report in reports if not report["error"]]
+    level = {
+        "sessions": sessions,
+        "ok": len(ok),
+        "errors": [report["error"] for report in reports if report["error"]],
+        "wall_s": wall,
+        "throughput_per_min": len(ok) / wall * 60,
+        "baseline_rss_mb": run["baseline_rss_mb"],
+        "peak_rss_mb": run["peak_rss_mb"],
+        # Memory the sessions added on top of the idle instance, averaged over the sessions (not any one session's peak)
+        "avg_rss_growth_per_session_mb": max(0.0, run["peak_rss_mb"] - run["baseline_rss_mb"]) / sessions,
+        "app_cpu_s": run["app_cpu_s"],
+        "ffmpeg_cpu_s": run["ffmpeg_cpu_s"],
+        # Share of every core on this machine kept busy by FFmpeg over the run
+        "ffmpeg_saturation": run["ffmpeg_cpu_s"] / (wall * (os.cpu_count() or 1)),
+        "stages": {},
+    }
+    for stage in STAGES:
+        values = [report["timings"][stage] for report in ok if stage in report["timings"]]
+        if values:
+            level["stages"][stage] = {f"p{p}": percentile(values, p) for p in PERCENTILES}
+    return level
+
+
+def print_level(level: dict) -> None:
+    print(f"\n== {level['sessions']} concurrent sessions: {level['ok']} ok, {len(level['errors'])} failed, "
+          f"{level['wall_s']:.1f}s wall, {level['throughput_per_min']:.1f} jobs/min")
+    print(f"   memory: instance peak {level['peak_rss_mb']:.0f} MB, {level['baseline_rss_mb']:.0f} MB before the "
+          f"sessions started, average RSS growth per session {level['avg_rss_growth_per_session_mb']:.0f} MB")
+    print(f"   CPU: app {level['app_cpu_s']:.1f}s, ffmpeg {level['ffmpeg_cpu_s']:.1f}s "
+          f"({level['ffmpeg_saturation']:.0%} of {os.cpu_count()} cores)")
+    for stage, values in level["stages"].items():
+        print(f"   {stage:<9} " + "  ".join(f"p{p} {values[f'p{p}']:6.2f}s" for p in PERCENTILES))
+    for error in sorted(set(level["errors"])):
+        print(f"   error: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how many concurrent CodeClipper sessions one instance can serve")
+    parser.add_argument("--sessions", default="1,2,4,8",
+                        help="Comma-separated numbers of concurrent sessions to try (default: 1,2,4,8)")
+    parser.add_argument("--media-seconds", type=float, default=180, help="Length of the synthetic video (default: 180)")
+    parser.add_argument("--transcribe-seconds", type=float, default=5,
+                        help="Simulated transcription turnaround (default: 5)")
+    parser.add_argument("--lemur-seconds", type=float, default=3, help="Simulated LeMUR latency (default: 3)")
+    parser.add_argument("--timeout", type=float, default=600, help="Timeout for each app run in seconds (default: 600)")
+    parser.add_argument("--json", help="Also write the raw results to this file")
+    args = parser.parse_args()
+
+    levels = [int(n) for n in args.sessions.split(",")]
+    api = FakeAssemblyAI(args.media_seconds, args.transcribe_seconds, args.lemur_seconds)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="codeclipper-load-") as work_dir:
+        media_path = os.path.join(work_dir, "tutorial.mp4")
+        print(f"Generating {args.media_seconds:.0f}s of synthetic video...")
+        make_media(media_path, args.media_seconds)
+        try:
+            for sessions in levels:
+                level = run_level(sessions, media_path, api.url, work_dir, args.timeout)
+                print_level(level)
+                results.append(level)
+        finally:
+            api.shutdown()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if all(level["ok"] == level["sessions"] for level in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
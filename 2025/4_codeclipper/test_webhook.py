@@ -0,0 +1,117 @@
+"""
+Tests for webhook completion. A local stand-in POSTs AssemblyAI's callback to the app's
+WebhookReceiver, and the transcript API is replaced by an in-process fake.
+
+Run with: python -m pytest test_webhook.py
+"""
+
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("ASSEMBLYAI_API_KEY", "test")
+
+import assemblyai as aai
+import httpx
+import pytest
+
+import main
+
+SECRET = "stand-in-secret"
+
+
+class FakeAPI:
+    """Transcripts are done once `done_after` seconds have passed since they were submitted"""
+
+    def __init__(self, done_after):
+        self.done_after = done_after
+        self.submitted = None
+        self.fetches = 0
+
+    def upload_file(self, path):
+        return "https://uploads.invalid/audio"
+
+    def submit(self, audio_url, config=None):
+        self.submitted = time.monotonic()
+        self.config = config
+        return SimpleNamespace(id="t1", status=aai.TranscriptStatus.queued)
+
+    def fetch_transcript(self, transcript_id):
+        self.fetches += 1
+        done = time.monotonic() - self.submitted >= self.done_after
+        return SimpleNamespace(id=transcript_id, status=aai.TranscriptStatus.completed if done
+                               else aai.TranscriptStatus.processing)
+
+
+@pytest.fixture
+def receiver():
+    receiver = main.WebhookReceiver("https://stand-in.invalid/webhook", 0, SECRET)
+    yield receiver
+    receiver.server.shutdown()
+    receiver.server.server_close()
+
+
+def make_client(monkeypatch, api):
+    client = main.AssemblyAIClient(max_concurrency=2)
+    client.transcriber = api
+    monkeypatch.setattr(client, "fetch_transcript", api.fetch_transcript)
+    monkeypatch.setattr(client, "next_poll_delay", lambda elapsed, audio_seconds=None: 0.05)
+    return client
+
+
+def post_callback(receiver, transcript_id, secret=SECRET, delay=0.0):
+    time.sleep(delay)
+    host, port = receiver.server.server_address
+    return httpx.post(f"http://{host}:{port}/", json={"transcript_id": transcript_id, "status": "completed"},
+                      headers={main.WEBHOOK_SECRET_HEADER: secret})
+
+
+def test_receiver_listens_on_localhost_by_default(receiver):
+    assert receiver.server.server_address[0] == "127.0.0.1"
+
+
+def test_callback_wakes_the_job_without_polling(monkeypatch, receiver):
+    api = FakeAPI(done_after=0.3)
+    client = make_client(monkeypatch, api)
+    threading.Thread(target=post_callback, args=(receiver, "t1"), kwargs={"delay": 0.3}).start()
+
+    transcript = client.transcribe("tutorial_audio.wav", webhook=receiver)
+
+    assert transcript.status == aai.TranscriptStatus.completed
+    assert api.config.webhook_auth_header_value == SECRET
+    assert api.fetches == 1
+    assert client.stats["polls"] == 0
+
+
+def test_missing_callback_falls_back_to_polling(monkeypatch, receiver):
+    monkeypatch.setattr(main, "WEBHOOK_TIMEOUT", 0.2)
+    api = FakeAPI(done_after=0.4)
+    client = make_client(monkeypatch, api)
+
+    transcript = client.transcribe("tutorial_audio.wav", webhook=receiver)
+
+    assert transcript.status == aai.TranscriptStatus.completed
+    assert client.stats["polls"] >= 1
+
+
+def test_callback_with_the_wrong_secret_is_rejected(receiver):
+    assert post_callback(receiver, "t1", secret="guess").status_code == 401
+    assert not receiver.wait("t1", 0.1)
+
+
+def test_callback_before_the_job_waits_still_counts(receiver):
+    assert post_callback(receiver, "t1").status_code == 200
+    assert receiver.wait("t1", 0)
+
+
+def test_callbacks_nobody_claims_are_dropped(monkeypatch, receiver):
+    assert not receiver.wait("late", 0.05)
+    post_callback(receiver, "late")
+    assert list(receiver._unclaimed) == ["late"]
+
+    monkeypatch.setattr(main, "WEBHOOK_UNCLAIMED_SECONDS", 0.0)
+    post_callback(receiver, "other")
+
+    assert list(receiver._unclaimed) == ["other"]
+    assert receiver._events == {}
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for VerbalizeCode
+Runs `main.py --help` and an invalid-argument call under `python -X importtime` and fails
+if the time spent importing modules goes over budget or a heavy module gets imported.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+# Import-time budget for a startup that only parses arguments
+DEFAULT_BUDGET_MS = 150
+
+# Modules that must only load once the code path that needs them runs
+HEAVY_MODULES = ["assemblyai", "pyaudio", "soundfile", "dotenv", "rich.markdown", "rich.syntax"]
+
+SCENARIOS = {
+    "--help": ["--help"],
+    "argument error": ["--duration", "not-a-number"],
+}
+
+
+def measure_imports(args):
+    """Run main.py with -X importtime and return (total import ms, set of imported modules)"""
+    result = subprocess.run([sys.executable, "-X", "importtime", MAIN, *args],
+                            capture_output=True, text=True)
+    total_us = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        # Format: "import time: <self us> | <cumulative us> | <indented module name>"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        total_us += int(self_us)
+        modules.add(name.strip())
+    return total_us / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that VerbalizeCode starts quickly")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_MS,
+                        help=f"Maximum import time in milliseconds (default: {DEFAULT_BUDGET_MS})")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per scenario, the fastest counts (default: 5)")
+    args = parser.parse_args()
+
+    failed = False
+    for scenario, cli_args in SCENARIOS.items():
+        runs = [measure_imports(cli_args) for _ in range(args.runs)]
+        best_ms = min(total for total, _ in runs)
+        heavy = sorted(name for name in HEAVY_MODULES if name in runs[0][1])
+
+        ok = best_ms <= args.budget and not heavy
+        failed = failed or not ok
+        print(f"{'PASS' if ok else 'FAIL'}  {scenario:<16} {best_ms:7.1f} ms imports (budget {args.budget:.0f} ms)")
+        if heavy:
+            print(f"      heavy modules imported: {', '.join(heavy)}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
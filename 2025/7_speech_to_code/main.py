@@ -6,110 +6,655 @@ using AssemblyAI's transcription and LeMUR capabilities.
 """
 
 import os
+import sys
+import json
+import uuid
+import contextlib
 import argparse
+import logging
+import random
+import re
+import threading
+import array
+import math
 import tempfile
+import time
 import wave
-import pyaudio
-import assemblyai as aai
+from collections import Counter
 from rich.console import Console
 from rich.panel import Panel
-from rich.markdown import Markdown
-from rich.syntax import Syntax
-from dotenv import load_dotenv
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Heavy modules (assemblyai, pyaudio, soundfile, dotenv, rich.syntax) are imported inside
+# the functions that need them, so `--help` and argument errors return immediately.
 
 console = Console()
-load_dotenv()
 
-# Initialize AssemblyAI
-aai_key = os.getenv("ASSEMBLYAI_API_KEY")
-if not aai_key:
-    console.print("[bold red]Error:[/] ASSEMBLYAI_API_KEY not found in environment variables.")
-    exit(1)
-aai.settings.api_key = aai_key
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used to size LeMUR requests
+CHARS_PER_TOKEN = 4
+# A transcript pasted into a LeMUR prompt must be wrapped like this to be recognised as a
+# copy of the context; plan_lemur_task never touches text that merely matches it
+TRANSCRIPT_BLOCK = "<transcript>\n{}\n</transcript>"
 
-def record_audio(duration=20, sample_rate=44100):
-    """Record audio from microphone for specified duration"""
-    console.print(f"[bold green]Recording[/] your code description for {duration} seconds...")
+def configure_api():
+    """Load settings from .env and initialize AssemblyAI, exiting if no API key is set"""
+    import assemblyai as aai
+    from dotenv import load_dotenv
     
-    chunk = 1024
-    audio_format = pyaudio.paInt16
-    channels = 1
+    load_dotenv()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"))
     
-    audio = pyaudio.PyAudio()
-    stream = audio.open(format=audio_format, channels=channels, rate=sample_rate,
-                       input=True, frames_per_buffer=chunk)
+    aai_key = os.getenv("ASSEMBLYAI_API_KEY")
+    if not aai_key:
+        console.print("[bold red]Error:[/] ASSEMBLYAI_API_KEY not found in environment variables.")
+        exit(1)
+    aai.settings.api_key = aai_key
+
+# 16 kHz mono is plenty for speech and a third of the data of 44.1 kHz
+RECORDING_SAMPLE_RATE = 16000
+# RMS level (16-bit PCM) below which a chunk counts as silence
+SILENCE_THRESHOLD = 500
+CHUNK_SIZE = 1024
+# How many earlier requests an interactive session keeps in its running context
+SESSION_HISTORY_TURNS = 3
+
+# Frames from these files mean a thread is on the network or blocked on a lock, queue or select
+# (used by the opt-in --profile sampling profiler)
+PROFILE_NETWORK_FILES = ("socket.py", "ssl.py")
+PROFILE_NETWORK_PACKAGES = tuple(package + os.sep for package in ("httpx", "httpcore", "h11", "websockets"))
+PROFILE_WAIT_FILES = ("threading.py", "queue.py", "selectors.py")
+
+# At most ASSEMBLYAI_MAX_CONCURRENCY (default 8) AssemblyAI requests are in flight per process
+# Transient API errors are retried with jittered exponential backoff (1s, 2s, 4s, ...)
+API_MAX_RETRIES = 4
+API_RETRY_BASE_DELAY = 1.0
+# Transcription usually finishes within this fraction of the audio length (but not faster
+# than the minimum), so polling backs off until then and tightens afterwards
+POLL_TURNAROUND_RATIO = 0.3
+POLL_MIN_EXPECTED_SECONDS = 5.0
+POLL_MAX_INTERVAL = 15.0
+
+class AssemblyAIClient:
+    """
+    Process-wide access to AssemblyAI: one Transcriber (so one pooled keep-alive HTTP
+    client), a cap on concurrent API requests, jittered exponential retries for transient
+    errors and polling that adapts to the length of the audio.
+    """
+    
+    def __init__(self, max_concurrency=None, max_retries=API_MAX_RETRIES, base_delay=API_RETRY_BASE_DELAY):
+        import assemblyai as aai
+        
+        max_concurrency = max_concurrency or int(os.getenv("ASSEMBLYAI_MAX_CONCURRENCY", "8"))
+        self.transcriber = aai.Transcriber()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "polls": 0}
+    
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+    
+    @staticmethod
+    def is_transient(error):
+        """Connection problems, rate limits and 5xx responses are worth retrying; other 4xx and failed transcripts are not"""
+        import httpx
+        
+        status_code = getattr(error, "status_code", None)
+        if status_code is not None:
+            return status_code == 429 or status_code >= 500
+        return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
+    
+    def call(self, fn, *args, **kwargs):
+        """
+        Run one API request under the concurrency limit, retrying transient failures. The
+        slot is held for this single request only, never while backing off or between polls.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._slots:
+                    self._count("requests")
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not self.is_transient(e):
+                    raise
+                self._count("retries")
+                delay = self.base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning("AssemblyAI request failed (%s), retrying in %.1fs", e, delay)
+                time.sleep(delay)
+    
+    @staticmethod
+    def next_poll_delay(elapsed, audio_seconds=None):
+        """Poll rarely while a transcript can't be finished yet and often once it is due"""
+        if audio_seconds:
+            expected = max(POLL_MIN_EXPECTED_SECONDS, audio_seconds * POLL_TURNAROUND_RATIO)
+            if elapsed < expected:
+                return min(max((expected - elapsed) / 2, 1.0), POLL_MAX_INTERVAL)
+            return 2.0
+        return min(1.0 + elapsed / 10, POLL_MAX_INTERVAL)
+    
+    @staticmethod
+    def fetch_transcript(transcript_id):
+        """A transcript's current state from a single GET (the SDK's get_by_id blocks until it completes)"""
+        import assemblyai as aai
+        
+        client = aai.Client.get_default()
+        return aai.Transcript.from_response(client=client,
+                                            response=aai.api.get_transcript(client.http_client, transcript_id))
+    
+    def transcribe(self, audio_file, audio_seconds=None, config=None):
+        """Upload and transcribe a file, returning the completed (or failed) transcript"""
+        import assemblyai as aai
+        
+        # Upload, then create the transcript, as two requests that each take a slot only while they run
+        audio_url = self.call(self.transcriber.upload_file, audio_file)
+        transcript = self.call(self.transcriber.submit, audio_url, config=config)
+        start = time.monotonic()
+        polls = 0
+        while transcript.status not in (aai.TranscriptStatus.completed, aai.TranscriptStatus.error):
+            time.sleep(self.next_poll_delay(time.monotonic() - start, audio_seconds))
+            transcript = self.call(self.fetch_transcript, transcript.id)
+            polls += 1
+            self._count("polls")
+        
+        logger.info("Transcript %s %s after %d polls in %.1fs (API stats: %s)", transcript.id,
+                    transcript.status.value, polls, time.monotonic() - start, self.stats)
+        return transcript
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """The shared AssemblyAI client for this process"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AssemblyAIClient()
+        return _client
+
+# Threads doing a profiled job's work, by thread ident: the job's own thread while its
+# SamplingProfiler runs, and pool workers while they run a task wrapped by job_task. A profile
+# only samples its job's threads, so other jobs running at the same time stay out of it
+_job_threads = {}
+
+
+class SamplingProfiler:
+    """
+    Low-overhead wall-clock profiler for one job. A daemon thread wakes every `interval`
+    seconds, reads the stacks of the job's threads with sys._current_frames() and counts them:
+    the thread that entered the profiler and the pool workers running its tasks.
+    Each sample is also put in a bucket: Python on the CPU, waiting on a child process,
+    on the network, or otherwise waiting. On exit the counts are written as folded stacks
+    (`thread;outer;...;inner count`, ready for flamegraph.pl or speedscope) next to a JSON
+    summary that adds the CPU time used by this process and by any child processes.
+    """
+
+    def __init__(self, job_id, output_dir, pipeline, interval=None):
+        self.job_id = job_id
+        self.pipeline = pipeline
+        self.interval = interval or float(os.getenv("PROFILE_INTERVAL_MS", "20")) / 1000
+        self.folded_path = os.path.join(output_dir, f"profile-{job_id}.folded")
+        self.summary_path = os.path.join(output_dir, f"profile-{job_id}.json")
+        self.stacks = Counter()
+        self.summary = {}
+        self._buckets = Counter()
+        self._python_leaves = Counter()
+        self._ticks = 0
+        self._labels = {}
+        self._thread_cpu = {}
+        # Frames are labelled by their path relative to the sys.path entry they were imported from
+        self._prefixes = sorted({os.path.join(os.path.abspath(p), "") for p in sys.path if p}, key=len, reverse=True)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _label(self, code):
+        """Short file name and flamegraph label of a code object"""
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            for prefix in self._prefixes:
+                if filename.startswith(prefix):
+                    filename = filename[len(prefix):]
+                    break
+            label = self._labels[code] = (filename, f"{code.co_name} ({filename}:{code.co_firstlineno})")
+        return label
+
+    def _bucket(self, thread_id, files, alive):
+        """What a sampled thread is spending its time on; files run from the innermost frame outwards"""
+        # A thread whose CPU clock moved since the last sample was running; otherwise its
+        # frames tell what it is blocked on
+        cpu = None
+        if alive and hasattr(time, "pthread_getcpuclockid"):
+            try:
+                cpu = time.clock_gettime(time.pthread_getcpuclockid(thread_id))
+            except OSError:
+                pass
+        previous = self._thread_cpu.get(thread_id)
+        self._thread_cpu[thread_id] = cpu
+        running = None if cpu is None or previous is None else cpu > previous
+        if running:
+            return "python"
+        if "subprocess.py" in files:
+            return "subprocess"
+        if any(filename in PROFILE_NETWORK_FILES or filename.startswith(PROFILE_NETWORK_PACKAGES) for filename in files):
+            return "network"
+        if running is False or files[0] in PROFILE_WAIT_FILES:
+            return "waiting"
+        return "python"
+
+    def _sample(self):
+        # One flamegraph row per kind of thread: "ThreadPoolExecutor-0_3" -> "ThreadPoolExecutor", "Thread-3 (worker)" -> "Thread (worker)"
+        names = {thread.ident: re.sub(r"[-_]\d+", "", thread.name) for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if _job_threads.get(thread_id) != self.job_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+
+            labels = [names.get(thread_id, "thread")] + [label for _, label in reversed(stack)]
+            self.stacks[";".join(labels)] += 1
+            bucket = self._bucket(thread_id, [filename for filename, _ in stack], thread_id in names)
+            self._buckets[bucket] += 1
+            if bucket == "python":
+                self._python_leaves[stack[0][1]] += 1
+        self._ticks += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    @staticmethod
+    def _cpu_usage():
+        """CPU seconds used so far by this process and by its finished child processes"""
+        if resource is None:
+            return None
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return own.ru_utime + own.ru_stime, children.ru_utime + children.ru_stime
+
+    def __enter__(self):
+        self._job_thread = threading.get_ident()
+        _job_threads[self._job_thread] = self.job_id
+        self._start_usage = self._cpu_usage()
+        self._start = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        del _job_threads[self._job_thread]
+        wall_seconds = time.perf_counter() - self._start
+        usage = self._cpu_usage()
+
+        # Sampling itself takes time, so a sample is worth the real time between ticks
+        seconds_per_sample = wall_seconds / self._ticks if self._ticks else self.interval
+        self.summary = {
+            "job_id": self.job_id,
+            "pipeline": self.pipeline,
+            "wall_seconds": round(wall_seconds, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": sum(self.stacks.values()),
+            # Process-wide, so other jobs running at the same time are included
+            "process_cpu_seconds": round(usage[0] - self._start_usage[0], 3) if usage else None,
+            "child_cpu_seconds": round(usage[1] - self._start_usage[1], 3) if usage else None,
+            "thread_seconds": {bucket: round(self._buckets[bucket] * seconds_per_sample, 3)
+                               for bucket in ("python", "subprocess", "network", "waiting")},
+            "hottest_python": [{"frame": label, "seconds": round(count * seconds_per_sample, 3)}
+                               for label, count in self._python_leaves.most_common(10)],
+        }
+        try:
+            with open(self.folded_path, "w") as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in self.stacks.items())
+            with open(self.summary_path, "w") as f:
+                json.dump(self.summary, f, indent=2)
+        except OSError as e:
+            logger.warning("Couldn't save the profile of job %s: %s", self.job_id, e)
+        logger.info("Profile of job %s: %s", self.job_id, self.describe())
+
+    def describe(self):
+        """One-line summary of where the job's time went"""
+        seconds = self.summary["thread_seconds"]
+        text = (f"{self.summary['wall_seconds']:.1f}s wall · thread time: Python {seconds['python']:.1f}s, "
+                f"subprocesses {seconds['subprocess']:.1f}s, network {seconds['network']:.1f}s, "
+                f"waiting {seconds['waiting']:.1f}s")
+        if self.summary["child_cpu_seconds"] is not None:
+            text += f" · child process CPU {self.summary['child_cpu_seconds']:.1f}s"
+        return text
+
+
+def profile_job(enabled, job_id, output_dir, pipeline):
+    """A SamplingProfiler around the job when profiling is on, otherwise a context that does nothing"""
+    if not enabled:
+        return contextlib.nullcontext()
+    os.makedirs(output_dir, exist_ok=True)
+    return SamplingProfiler(job_id, output_dir, pipeline)
+
+
+def report_profile(profiler):
+    """Print where a profiled job's time went and where its profile was saved"""
+    if profiler is None or not profiler.summary:
+        return
+    console.print(f"[dim]🔬 {profiler.describe()}[/]")
+    console.print(f"[bold green]Profile saved to:[/] {profiler.folded_path}")
+
+def audio_duration(path):
+    """Length of an audio file in seconds, or None if soundfile can't read it"""
+    import soundfile as sf
     
-    frames = []
-    for i in range(0, int(sample_rate / chunk * duration)):
-        data = stream.read(chunk)
-        frames.append(data)
-        if i % 10 == 0:
-            seconds_left = duration - int((i * chunk) / sample_rate)
-            console.print(f"⏱️ {seconds_left} seconds remaining...", end="\r")
+    try:
+        return sf.info(path).duration
+    except Exception:
+        return None
+
+def frame_rms(data):
+    """Root-mean-square energy of a chunk of 16-bit PCM audio"""
+    samples = array.array("h", data)
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+def open_input_stream(audio, sample_rate=RECORDING_SAMPLE_RATE, start=True):
+    """Open a 16-bit mono microphone stream on an existing PyAudio instance"""
+    import pyaudio
+    return audio.open(format=pyaudio.paInt16, channels=1, rate=sample_rate,
+                      input=True, frames_per_buffer=CHUNK_SIZE, start=start)
+
+def record_audio(duration=20, sample_rate=RECORDING_SAMPLE_RATE, silence_seconds=2.0,
+                 silence_threshold=SILENCE_THRESHOLD, stream=None):
+    """
+    Record audio from microphone until trailing silence, for at most `duration` seconds.
+    Pass an already opened `stream` to reuse the audio device across recordings.
+    """
+    import pyaudio
     
-    stream.stop_stream()
-    stream.close()
-    audio.terminate()
+    console.print(f"[bold green]Recording[/] your code description (up to {duration} seconds, stops when you go quiet)...")
+    
+    chunk = CHUNK_SIZE
+    max_silent_chunks = int(silence_seconds * sample_rate / chunk)
     
     with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
-        wf = wave.open(tmp_file.name, 'wb')
-        wf.setnchannels(channels)
-        wf.setsampwidth(audio.get_sample_size(audio_format))
-        wf.setframerate(sample_rate)
-        wf.writeframes(b''.join(frames))
+        audio_path = tmp_file.name
+    
+    audio = None
+    if stream is None:
+        audio = pyaudio.PyAudio()
+        stream = open_input_stream(audio, sample_rate)
+    else:
+        stream.start_stream()
+    
+    # Write frames as they arrive instead of holding the whole recording in memory
+    wf = wave.open(audio_path, 'wb')
+    wf.setnchannels(1)
+    wf.setsampwidth(pyaudio.get_sample_size(pyaudio.paInt16))
+    wf.setframerate(sample_rate)
+    
+    heard_speech = False
+    silent_chunks = 0
+    try:
+        for i in range(0, int(sample_rate / chunk * duration)):
+            data = stream.read(chunk, exception_on_overflow=False)
+            wf.writeframes(data)
+            
+            if frame_rms(data) >= silence_threshold:
+                heard_speech = True
+                silent_chunks = 0
+            elif heard_speech and max_silent_chunks:
+                silent_chunks += 1
+                if silent_chunks >= max_silent_chunks:
+                    break
+            
+            if i % 10 == 0:
+                seconds_left = duration - int((i * chunk) / sample_rate)
+                console.print(f"⏱️ {seconds_left} seconds remaining...", end="\r")
+    finally:
+        stream.stop_stream()
+        if audio is not None:
+            stream.close()
+            audio.terminate()
         wf.close()
-        return tmp_file.name
+    
+    return audio_path
+
+def compress_audio(wav_path):
+    """
+    Encode a WAV recording as FLAC (lossless) before upload and report the savings.
+    Returns the path to the FLAC file and removes the WAV file. If encoding fails, the
+    WAV path is returned instead, so the caller uploads it and removes it as usual.
+    """
+    start = time.perf_counter()
+    flac_path = os.path.splitext(wav_path)[0] + ".flac"
+    try:
+        import soundfile as sf
+        
+        data, sample_rate = sf.read(wav_path, dtype="int16")
+        sf.write(flac_path, data, sample_rate, format="FLAC", subtype="PCM_16")
+    except (ImportError, OSError, RuntimeError) as e:
+        # soundfile reports libsndfile errors as RuntimeError subclasses
+        if os.path.exists(flac_path):
+            os.remove(flac_path)
+        console.print(f"[yellow]Couldn't compress the recording ({e}), uploading it as WAV[/]")
+        return wav_path
+    elapsed = time.perf_counter() - start
+    
+    before = os.path.getsize(wav_path)
+    after = os.path.getsize(flac_path)
+    os.remove(wav_path)
+    console.print(f"[dim]Compressed recording: {before / 1024:.0f} KB → {after / 1024:.0f} KB "
+                  f"({before / max(after, 1):.1f}x smaller) in {elapsed * 1000:.0f} ms[/]")
+    return flac_path
+
+def estimate_tokens(text):
+    """Rough token count of a piece of text (about 4 characters per token for English)"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def plan_lemur_task(prompt, context_text, default_model, fast_model=None):
+    """
+    Assemble a LeMUR task prompt and choose its model tier.
+    
+    LeMUR already sends the transcript (or input text) as context, so a copy of it pasted
+    into the prompt as a TRANSCRIPT_BLOCK is removed before the request goes out. Other
+    occurrences of the same text (say, a short utterance repeated in a list of earlier
+    requests) are left alone. Requests whose
+    context + prompt fit within LEMUR_FAST_TOKEN_BUDGET use the fast tier (Claude 3 Haiku
+    unless `fast_model` is given); everything else uses the app's default model.
+    The decision is logged for every call.
+    """
+    import assemblyai as aai
+    
+    fast_model = fast_model or aai.LemurModel.claude3_haiku
+    # LeMUR requests up to this many tokens use the fast model tier (0 = always use the default model)
+    budget = int(os.getenv("LEMUR_FAST_TOKEN_BUDGET", "0"))
+    prompt = prompt.strip()
+    context_text = context_text or ""
+    duplicated_tokens = 0
+    pasted_block = TRANSCRIPT_BLOCK.format(context_text)
+    if context_text and pasted_block in prompt:
+        duplicated_tokens = estimate_tokens(pasted_block)
+        prompt = prompt.replace(pasted_block, "(see the transcript provided as context)")
+    
+    context_tokens = estimate_tokens(context_text)
+    prompt_tokens = estimate_tokens(prompt)
+    total_tokens = context_tokens + prompt_tokens
+    model = fast_model if total_tokens <= budget else default_model
+    logger.info(
+        "LeMUR budget: context=%d prompt=%d total=%d tokens (removed %d duplicated), budget=%d -> %s",
+        context_tokens, prompt_tokens, total_tokens, duplicated_tokens, budget, model.value
+    )
+    return prompt, model
 
 def generate_code(audio_file, language):
     """Transcribe audio and generate code using LeMUR"""
+    import assemblyai as aai
+    
     with console.status("[bold blue]Transcribing your description...") as status:
-        transcriber = aai.Transcriber()
-        transcript = transcriber.transcribe(audio_file)
+        transcript = get_client().transcribe(audio_file, audio_seconds=audio_duration(audio_file))
         
         # Store transcript text for later display
         transcribed_text = transcript.text
         
         status.update("[bold blue]Generating code from your description...")
         
+        # The transcript is attached by LeMUR as context, so it is not pasted into the prompt
         code_prompt = f"""
-        Transform this verbal description into working {language} code:
-        
-        {transcribed_text}
+        Transform the verbal description in this transcript into working {language} code.
         
         IMPORTANT: RETURN ONLY THE CODE. DO NOT INCLUDE A PREAMBLE OR ANY SORT OF EXPLANATION OR INTRODUCTION. RETURN JUST CODE.
         
         Make sure it's properly formatted, efficient, and follows best practices for {language}.
         """
         
-        lemur_response = transcript.lemur.task(
-            code_prompt.strip(),
-            final_model=aai.LemurModel.claude3_haiku
-        )
+        prompt, model = plan_lemur_task(code_prompt, transcribed_text, aai.LemurModel.claude3_haiku)
+        lemur_response = get_client().call(transcript.lemur.task, prompt, final_model=model)
         return lemur_response.response, transcribed_text
 
+def clean_code_block(code, language):
+    """Remove markdown code fences from a LeMUR response"""
+    return code.replace("```" + language, "").replace("```", "").strip()
+
+def refine_code(utterance, current_code, history, language):
+    """
+    Ask LeMUR to write or update code from one new spoken request.
+    
+    Only the new utterance is sent as LeMUR input; earlier turns are represented by the
+    latest version of the code plus a short list of previous requests, so each turn
+    costs a single small LeMUR call no matter how long the session runs.
+    """
+    import assemblyai as aai
+    
+    context_lines = [f"- {request[:200]}" for request in history[-SESSION_HISTORY_TURNS:]]
+    context = ""
+    if current_code:
+        context += f"Current {language} code:\n{current_code}\n\n"
+    if context_lines:
+        context += "Earlier requests:\n" + "\n".join(context_lines) + "\n\n"
+    
+    code_prompt = f"""
+    {context}The input text is a new spoken request. {"Update the current code to satisfy it" if current_code else f"Transform it into working {language} code"}.
+    
+    IMPORTANT: RETURN ONLY THE COMPLETE CODE. DO NOT INCLUDE A PREAMBLE OR ANY SORT OF EXPLANATION OR INTRODUCTION. RETURN JUST CODE.
+    
+    Make sure it's properly formatted, efficient, and follows best practices for {language}.
+    """
+    
+    prompt, model = plan_lemur_task(code_prompt, utterance, aai.LemurModel.claude3_haiku)
+    lemur_response = get_client().call(aai.Lemur().task, prompt, input_text=utterance, final_model=model)
+    return clean_code_block(lemur_response.response, language)
+
+def run_session(args, profile_dir="."):
+    """Push-to-talk loop that keeps the microphone and API client open between turns"""
+    import pyaudio
+    from rich.syntax import Syntax
+    
+    console.print("[bold]Interactive session:[/] press [bold]Enter[/] to talk, type [bold]q[/] to quit.\n")
+    
+    audio = pyaudio.PyAudio()
+    stream = open_input_stream(audio, start=False)
+    client = get_client()
+    current_code = ""
+    history = []
+    
+    try:
+        while True:
+            command = console.input("[bold cyan]🎤 Enter to talk, q to quit › [/]").strip().lower()
+            if command in ("q", "quit", "exit"):
+                break
+            
+            audio_file = None
+            try:
+                turn_start = time.perf_counter()
+                audio_file = record_audio(duration=args.duration, silence_seconds=args.silence, stream=stream)
+                if not args.no_compress:
+                    audio_file = compress_audio(audio_file)
+                captured = time.perf_counter()
+                
+                # Each turn's transcription and LeMUR call is profiled as one job
+                with profile_job(args.profile, uuid.uuid4().hex, profile_dir, "refine_code") as profiler:
+                    with console.status("[bold blue]Transcribing..."):
+                        transcript = client.transcribe(audio_file, audio_seconds=audio_duration(audio_file))
+                    transcribed = time.perf_counter()
+                    if not transcript.text:
+                        console.print("[yellow]Didn't catch that, try again.[/]")
+                        continue
+                    
+                    console.print(Panel(transcript.text, title="📝 You said", border_style="blue", expand=False))
+                    with console.status("[bold blue]Updating code..."):
+                        current_code = refine_code(transcript.text, current_code, history, args.language)
+                history.append(transcript.text)
+                finished = time.perf_counter()
+                
+                console.print(Panel(
+                    Syntax(current_code, args.language, theme="monokai", line_numbers=True),
+                    title=f"💻 {args.language.capitalize()} Code (turn {len(history)})", border_style="green"
+                ))
+                console.print(f"[dim]Turn latency: capture {captured - turn_start:.1f}s · "
+                              f"transcription {transcribed - captured:.1f}s · LeMUR {finished - transcribed:.1f}s[/]")
+                report_profile(profiler)
+                
+                if args.output:
+                    with open(args.output, "w") as f:
+                        f.write(current_code)
+                    console.print(f"[bold green]Code saved to:[/] {args.output}")
+            except Exception as e:
+                console.print(f"[bold red]Error:[/] {str(e)}")
+            finally:
+                if audio_file and os.path.exists(audio_file):
+                    os.remove(audio_file)
+    finally:
+        stream.close()
+        audio.terminate()
+
 def main():
     parser = argparse.ArgumentParser(description="Transform verbal code descriptions into actual code")
     parser.add_argument("--language", "-l", default="python", 
                         help="Programming language (default: python)")
     parser.add_argument("--duration", "-d", type=int, default=20, 
-                        help="Recording duration in seconds (default: 20)")
+                        help="Maximum recording duration in seconds (default: 20)")
+    parser.add_argument("--silence", type=float, default=2.0,
+                        help="Stop after this many seconds of silence, 0 to record the full duration (default: 2)")
+    parser.add_argument("--no-compress", action="store_true",
+                        help="Upload the raw WAV recording instead of compressing it to FLAC")
     parser.add_argument("--output", "-o", help="Output file (optional)")
+    parser.add_argument("--session", "-s", action="store_true",
+                        help="Interactive session: refine the code over several push-to-talk turns")
+    parser.add_argument("--profile", action="store_true",
+                        help="Save a sampling profile of each job next to the output (same as PROFILE=1)")
     args = parser.parse_args()
     
+    configure_api()
+    args.profile = args.profile or os.getenv("PROFILE") == "1"
+    profile_dir = os.path.dirname(args.output or "") or "."
+    
     console.print(Panel.fit(
         "[bold cyan]💻 VerbalizeCode: Speech-to-Code Generator 🎤[/]\n"
         f"Describe the code you want in [bold yellow]{args.language}[/] and I'll create it!",
         title="🧙 Speech-to-Code", subtitle="Powered by AssemblyAI"
     ))
     
+    if args.session:
+        run_session(args, profile_dir)
+        return
+    
     try:
-        audio_file = record_audio(duration=args.duration)
+        audio_file = record_audio(duration=args.duration, silence_seconds=args.silence)
         console.print("[green]✓[/] Recording complete!")
+        if not args.no_compress:
+            audio_file = compress_audio(audio_file)
         
-        code, transcribed_text = generate_code(audio_file, args.language)
+        with profile_job(args.profile, uuid.uuid4().hex, profile_dir, "generate_code") as profiler:
+            code, transcribed_text = generate_code(audio_file, args.language)
         
         # Clean up the code (remove markdown code blocks if present)
-        clean_code = code.replace("```" + args.language, "").replace("```", "").strip()
+        clean_code = clean_code_block(code, args.language)
         
         # Display the transcribed text
         console.print(Panel(
@@ -122,6 +667,7 @@ def main():
         console.print("\n[bold cyan]↓ Transformed Into Code ↓[/]\n")
         
         # Display the code with syntax highlighting
+        from rich.syntax import Syntax
         console.print(Panel(
             Syntax(clean_code, args.language, theme="monokai", line_numbers=True),
             title=f"💻 {args.language.capitalize()} Code Generated", border_style="green"
@@ -132,6 +678,7 @@ def main():
             with open(args.output, "w") as f:
                 f.write(clean_code)
             console.print(f"[bold green]Code saved to:[/] {args.output}")
+        report_profile(profiler)
         
     except Exception as e:
         console.print(f"[bold red]Error:[/] {str(e)}")
@@ -0,0 +1,55 @@
+"""
+Tests for how Speech-to-Code builds its LeMUR prompts. LeMUR is replaced by a fake client
+that records each request instead of sending it.
+
+Run with: python -m pytest test_refine_code.py
+"""
+
+from types import SimpleNamespace
+
+import assemblyai as aai
+import pytest
+
+import main
+
+
+class RecordingClient:
+    def __init__(self):
+        self.requests = []
+
+    def call(self, task, prompt, **kwargs):
+        self.requests.append({"prompt": prompt, **kwargs})
+        return SimpleNamespace(response="```python\nsorted(items)\n```")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(aai.settings, "api_key", "test")
+    recording = RecordingClient()
+    monkeypatch.setattr(main, "get_client", lambda: recording)
+    return recording
+
+
+def test_refine_prompt_keeps_history_and_code_that_repeat_the_utterance(client):
+    current_code = "# Sort\nitems = [3, 1, 2]\n"
+    history = ["Sort", "Make a list of three numbers"]
+
+    code = main.refine_code("Sort", current_code, history, "python")
+
+    request = client.requests[0]
+    assert code == "sorted(items)"
+    assert request["input_text"] == "Sort"
+    assert current_code.strip() in request["prompt"]
+    assert "- Sort\n- Make a list of three numbers" in request["prompt"]
+    assert "(see the transcript provided as context)" not in request["prompt"]
+
+
+def test_only_a_pasted_transcript_block_is_removed():
+    transcript = "Sort the list, then print it"
+    prompt = (f"Earlier request: {transcript}\n\n{main.TRANSCRIPT_BLOCK.format(transcript)}\n\n"
+              "Write the code.")
+
+    planned, _ = main.plan_lemur_task(prompt, transcript, aai.LemurModel.claude3_haiku)
+
+    assert planned == (f"Earlier request: {transcript}\n\n(see the transcript provided as context)\n\n"
+                       "Write the code.")